@@ -1,4 +1,4 @@
-from typing import Set
+from typing import Dict, List, Set
 
 from pydantic_settings import BaseSettings
 
@@ -10,12 +10,62 @@ class Settings(BaseSettings):
     DEFAULT_MODEL: str = "qwen3-coder-30b-a3b-instruct"
     LLM_TEMPERATURE: float = 0.1
     LLM_TIMEOUT: int = 300
-    NUM_CTX: int = 4096
+    NUM_CTX: int = 4096  # fallback max_tokens for calls without a task-specific cap
+    MAX_TOKENS_CHUNK: int = 1024  # output cap per chunk analysis; also reserved when sizing chunks
+    MAX_TOKENS_MERGE: int = 1536
+    MAX_TOKENS_FOLLOWUP: int = 512
+    MAX_TOKENS_GENERATE: int = 4096
+    MIN_OUTPUT_TOKENS: int = 128  # smallest answer worth requesting when a token budget runs low
     MAX_FILE_SIZE_MB: int = 50
+    MULTIPART_OVERHEAD_KB: int = 64  # allowance for multipart framing and form fields on top of MAX_FILE_SIZE_MB
+    MAX_UNCOMPRESSED_MB: int = 100  # total decompressed size allowed per archive
+    MAX_ZIP_ENTRIES: int = 5000
+    MAX_COMPRESSION_RATIO: float = 100.0  # per-entry and whole-archive uncompressed/compressed cap
+    UPLOAD_READ_CHUNK_BYTES: int = 1024 * 1024
+    MAX_ANALYSIS_MEMORY_MB: int = 512  # in-flight source memory across concurrent requests
+    ANALYSIS_MEMORY_FACTOR: float = 1.5  # source buffer plus the chunk prompts in flight during one analysis
     MAX_JAVA_FILES: int = 150
     MAX_CHARS_PER_CHUNK: int = 8000
     MAX_MERGE_CHARS: int = 6000  # cap merged partial results sent to LLM
-    UPLOAD_DIR: str = "temp_uploads"
+    CHARS_PER_TOKEN: float = 3.5  # rough chars-per-token ratio for Java source
+    PROMPT_OVERHEAD_TOKENS: int = 300  # system prompt and per-file headers
+    MIN_CHARS_PER_CHUNK: int = 2000
+    MODEL_CONTEXT_OVERRIDES: Dict[str, int] = {}  # model id -> context length when the server doesn't report one
+    MODEL_INFO_TTL: int = 300  # seconds to cache a model's reported context length
+    CHUNK_LATENCY_TARGET_RATIO: float = 0.5  # keep predicted chunk latency under this share of LLM_TIMEOUT
+    LLM_MAX_CONCURRENT_PER_BACKEND: int = 2  # in-flight LLM calls per LM Studio server; the rest queue by priority
+    CLIENT_WEIGHTS: Dict[str, float] = {}  # client id (X-Client-ID or IP) -> fair-queuing weight, default 1.0
+    LLM_MAX_RETRIES: int = 2  # retries of a transient LLM failure before giving up on a chunk
+    LLM_RETRY_BASE_DELAY: float = 1.0  # seconds; backoff is full-jitter exponential
+    MAX_CHUNK_SPLITS: int = 3  # bisections of a timed-out or overflowing chunk before skipping it
+    CHUNK_CONCURRENCY: int = 1  # parallel chunk calls per analysis
+    EARLY_EXIT_ENABLED: bool = False
+    EARLY_EXIT_CONFIDENCE: float = 0.8  # 0..1, minimum self-reported confidence that counts as a vote
+    EARLY_EXIT_MIN_AGREEMENT: int = 2  # chunks that must agree before remaining chunks are skipped
+    ADMISSION_MAX_PREDICTED_SECONDS: float = 300.0  # reject analyses whose predicted queue time exceeds this
+    ADMISSION_MAX_DEFER: float = 0.0  # seconds an over-limit analysis may wait for capacity before a 503
+    ADMISSION_MAX_PENDING_PER_CLIENT: int = 4  # concurrent analyses per client before a 429
+    ADMISSION_INITIAL_CALL_SECONDS: float = 30.0  # per-call latency assumed until calls are observed
+    ADMISSION_LATENCY_SMOOTHING: float = 0.2  # EWMA weight of each observed call latency
+    HIERARCHICAL_ANALYSIS: bool = False  # summarize each file first, then analyze the summaries
+    MAX_TOKENS_SUMMARY: int = 2048  # output cap of one file-summary call
+    SUMMARY_MAX_CHARS: int = 600  # per-file summary length kept for stage two
+    SUMMARY_CACHE_PATH: str = "summary_cache.sqlite3"
+    SUMMARY_CACHE_MEMORY_ENTRIES: int = 10000  # summaries kept in memory in front of the SQLite tier
+    SIMILARITY_INDEX_ENABLED: bool = False  # reuse or seed from near-duplicate projects analyzed before
+    SIMILARITY_INDEX_PATH: str = "project_index.sqlite3"
+    SIMILARITY_NUM_PERM: int = 128  # MinHash signature length
+    SIMILARITY_BANDS: int = 16  # LSH bands; more bands find less similar candidates
+    SIMILARITY_REUSE_THRESHOLD: float = 0.9  # estimated Jaccard at which a prior result is returned as is
+    SIMILARITY_SEED_THRESHOLD: float = 0.6  # estimated Jaccard at which a prior result seeds the prompt
+    SIMILARITY_SEED_CHARS: int = 1500  # prior analysis length included in seeded prompts
+    WARMUP_ENABLED: bool = True
+    WARMUP_MODELS: List[str] = []  # models kept resident; empty means DEFAULT_MODEL plus the most-used ones
+    WARMUP_TOP_MODELS: int = 2  # most-used models added to DEFAULT_MODEL when WARMUP_MODELS is empty
+    WARMUP_INTERVAL: int = 240  # seconds between keep-alive pings; keep below the server's idle unload time
+    TRACE_HISTORY_SIZE: int = 200  # finished request traces kept for /debug/traces
+    PROFILING_ENABLED: bool = False  # allow X-Profile: 1 to capture a cProfile of one request
+    PROFILE_DIR: str = "profiles"
     SKIP_DIRS: Set[str] = {
         ".git",
         "target",
@@ -0,0 +1,201 @@
+import logging
+import socket
+import threading
+from contextvars import ContextVar
+from typing import Callable, List, Set
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+# Why a scope was cancelled; a child scope cancelled with its parent takes the parent's reason.
+CANCEL_DISCONNECTED = "client disconnected"
+CANCEL_EARLY_EXIT = "early exit"
+
+
+class ScopeCancelled(Exception):
+    """Raised below the client when a call's scope is cancelled before the call is sent."""
+
+
+class CancelScope:
+    """Cancellation state shared by every LLM call made for one request.
+
+    Cancelling marks the scope so calls that have not been sent fail fast, and shuts
+    down the sockets of calls that are waiting on the server so they abort upstream.
+    A child scope is cancelled with its parent but can also be cancelled on its own.
+    """
+
+    def __init__(self, parent: "CancelScope | None" = None) -> None:
+        """Initialize an uncancelled scope with no tracked connections, optionally under a parent."""
+        self._event = threading.Event()
+        self._sockets: Set[socket.socket] = set()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self._parent = parent
+        self.reason: str | None = None
+        if parent is not None:
+            parent.subscribe(self._cancel_with_parent)
+            if parent.cancelled:
+                self._cancel_with_parent()
+
+    @property
+    def cancelled(self) -> bool:
+        """Return whether the scope was cancelled."""
+        return self._event.is_set()
+
+    def cancel(self, reason: str = CANCEL_DISCONNECTED) -> int:
+        """Cancel the scope and abort its in-flight calls, returning how many were aborted."""
+        with self._lock:
+            if self.reason is None:
+                self.reason = reason
+            self._event.set()
+            sockets = list(self._sockets)
+            self._sockets.clear()
+            callbacks = list(self._callbacks)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        for callback in callbacks:
+            callback()
+        return len(sockets)
+
+    def close(self) -> None:
+        """Detach a child scope from its parent once its work is done."""
+        if self._parent is not None:
+            self._parent.unsubscribe(self._cancel_with_parent)
+
+    def _cancel_with_parent(self) -> None:
+        """Cancel this child scope for the reason its parent was cancelled."""
+        self.cancel(self._parent.reason or CANCEL_DISCONNECTED)
+
+    def subscribe(self, callback: Callable[[], None]) -> None:
+        """Call ``callback`` when the scope is cancelled, e.g. to wake a caller waiting for a slot."""
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def unsubscribe(self, callback: Callable[[], None]) -> None:
+        """Stop notifying a callback registered with subscribe."""
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def track(self, sock: socket.socket) -> None:
+        """Register the socket of a call that is waiting on the server."""
+        with self._lock:
+            self._sockets.add(sock)
+        if self.cancelled:
+            self.cancel()
+
+    def untrack(self, sock: socket.socket) -> None:
+        """Forget a socket once its call has its response."""
+        with self._lock:
+            self._sockets.discard(sock)
+
+
+# Set by the routes; LLM calls made while handling the request (including on worker threads
+# that copied the request context) check it before sending and register their connections.
+cancel_scope: ContextVar[CancelScope | None] = ContextVar("cancel_scope", default=None)
+
+
+class CancellationStats:
+    """Process-wide counters of LLM work avoided because clients went away or results were no longer needed."""
+
+    def __init__(self) -> None:
+        """Initialize all counters at zero."""
+        self.requests_abandoned = 0
+        self.calls_aborted = 0
+        self.calls_skipped = 0
+        self.tokens_saved = 0
+        self.early_exit_calls_aborted = 0
+        self.early_exit_calls_skipped = 0
+        self.early_exit_tokens_saved = 0
+        self._lock = threading.Lock()
+
+    def record_abandoned(self) -> None:
+        """Count a request whose client disconnected before it finished."""
+        with self._lock:
+            self.requests_abandoned += 1
+
+    def record_call(self, sent: bool, tokens_saved: int, early_exit: bool = False) -> None:
+        """Count a call aborted in flight (sent) or never sent, with the tokens it did not use.
+
+        Calls dropped because early exit already had its answer are counted apart from disconnects.
+        """
+        with self._lock:
+            if early_exit:
+                if sent:
+                    self.early_exit_calls_aborted += 1
+                else:
+                    self.early_exit_calls_skipped += 1
+                self.early_exit_tokens_saved += tokens_saved
+                return
+            if sent:
+                self.calls_aborted += 1
+            else:
+                self.calls_skipped += 1
+            self.tokens_saved += tokens_saved
+
+    def snapshot(self) -> dict:
+        """Return the counters for health reporting."""
+        with self._lock:
+            return {
+                "requests_abandoned": self.requests_abandoned,
+                "calls_aborted": self.calls_aborted,
+                "calls_skipped": self.calls_skipped,
+                "tokens_saved_estimate": self.tokens_saved,
+                "early_exit": {
+                    "calls_aborted": self.early_exit_calls_aborted,
+                    "calls_skipped": self.early_exit_calls_skipped,
+                    "tokens_saved_estimate": self.early_exit_tokens_saved,
+                },
+            }
+
+
+cancellation_stats = CancellationStats()
+
+
+class _TrackedResponseMixin:
+    """Register the connection's socket with the current cancel scope while awaiting a response."""
+
+    def getresponse(self, *args, **kwargs):
+        scope = cancel_scope.get()
+        sock = getattr(self, "sock", None)
+        if scope is None or sock is None:
+            return super().getresponse(*args, **kwargs)
+        scope.track(sock)
+        try:
+            return super().getresponse(*args, **kwargs)
+        finally:
+            scope.untrack(sock)
+
+
+class _CancellableHTTPConnection(_TrackedResponseMixin, HTTPConnection):
+    pass
+
+
+class _CancellableHTTPSConnection(_TrackedResponseMixin, HTTPSConnection):
+    pass
+
+
+class _CancellableHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CancellableHTTPConnection
+
+
+class _CancellableHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CancellableHTTPSConnection
+
+
+class CancellableAdapter(HTTPAdapter):
+    """Transport adapter whose pending responses can be aborted through a CancelScope."""
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CancellableHTTPConnectionPool,
+            "https": _CancellableHTTPSConnectionPool,
+        }
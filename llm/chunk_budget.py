@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+from config import settings
+from llm.client import OllamaClient
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkBudgetPlanner:
+    """Derive a per-model chunk size from its context window and observed call latency."""
+
+    MAX_OBSERVATIONS: int = 50
+
+    def __init__(self, ollama_client: OllamaClient | None = None) -> None:
+        """Initialize the planner with an optional client used to look up model context."""
+        self.ollama_client = ollama_client or OllamaClient()
+        self._context_cache: Dict[str, Tuple[int | None, float]] = {}
+        self._observations: Dict[str, Deque[Tuple[int, float]]] = {}
+        self._lock = threading.Lock()
+
+    def context_length(self, model: str) -> int | None:
+        """Return the context length the server reports for the model, else its MODEL_CONTEXT_OVERRIDES entry."""
+        with self._lock:
+            cached = self._context_cache.get(model)
+        if cached and time.monotonic() - cached[1] < settings.MODEL_INFO_TTL:
+            context = cached[0]
+        else:
+            context = self.ollama_client.get_context_length(model)
+            with self._lock:
+                self._context_cache[model] = (context, time.monotonic())
+        if context is None:
+            return settings.MODEL_CONTEXT_OVERRIDES.get(model)
+        return context
+
+    def chars_per_chunk(self, model: str, max_output: int | None = None) -> int:
+        """Return the largest chunk size that fits the model's context and latency target.
+
+        ``max_output`` is the output cap the chunk's call will request; it defaults to MAX_TOKENS_CHUNK.
+        """
+        context = self.context_length(model)
+        if context is None:
+            budget = settings.MAX_CHARS_PER_CHUNK
+        else:
+            usable_tokens = context - (max_output or settings.MAX_TOKENS_CHUNK) - settings.PROMPT_OVERHEAD_TOKENS
+            budget = int(usable_tokens * settings.CHARS_PER_TOKEN)
+
+        latency_cap = self._latency_capped_chars(model)
+        if latency_cap is not None and latency_cap < budget:
+            logger.info("Chunk budget for %s capped by latency: %d -> %d chars", model, budget, latency_cap)
+            budget = latency_cap
+
+        return max(budget, settings.MIN_CHARS_PER_CHUNK)
+
+    def record(self, model: str, prompt_chars: int, elapsed: float) -> None:
+        """Record how long a call with a prompt of the given size took."""
+        with self._lock:
+            observations = self._observations.setdefault(model, deque(maxlen=self.MAX_OBSERVATIONS))
+            observations.append((prompt_chars, elapsed))
+
+    def _latency_capped_chars(self, model: str) -> int | None:
+        """Return the prompt size predicted to finish within the latency target, if enough data exists."""
+        with self._lock:
+            observations = list(self._observations.get(model, ()))
+        if not observations:
+            return None
+
+        target = settings.LLM_TIMEOUT * settings.CHUNK_LATENCY_TARGET_RATIO
+        intercept, slope = self._fit(observations)
+        if slope <= 0 or intercept >= target:
+            return None
+        return int((target - intercept) / slope)
+
+    @staticmethod
+    def _fit(observations: list[Tuple[int, float]]) -> Tuple[float, float]:
+        """Fit latency = intercept + slope * chars, falling back to a proportional model."""
+        n = len(observations)
+        mean_x = sum(x for x, _ in observations) / n
+        mean_y = sum(y for _, y in observations) / n
+        var_x = sum((x - mean_x) ** 2 for x, _ in observations)
+        if n >= 3 and var_x > 0:
+            slope = sum((x - mean_x) * (y - mean_y) for x, y in observations) / var_x
+            intercept = mean_y - slope * mean_x
+            if slope > 0 and intercept >= 0:
+                return intercept, slope
+        return 0.0, mean_y / mean_x if mean_x else 0.0
@@ -1,6 +1,14 @@
-from typing import Dict, List
+import re
+from typing import Dict, List, Mapping
 
 from config import settings
+from utils.source_set import SourceSet
+
+# Bytes patterns: chunks are scored straight from the source buffer without decoding.
+_ABSTRACTION_RE = re.compile(rb"\b(?:interface|abstract\s+class)\s+\w+")
+_MAIN_METHOD_RE = re.compile(rb"public\s+static\s+void\s+main\s*\(")
+_TRUNCATED_NOTE = "\n\n[FILE TRUNCATED DUE TO SIZE]"
+_ENTRY_POINT_NAMES = {"App", "Main", "Application"}
 
 
 class Chunker:
@@ -10,31 +18,58 @@ class Chunker:
         """Initialize the chunker with a maximum character limit per chunk."""
         self.max_chars = max_chars or settings.MAX_CHARS_PER_CHUNK
 
-    def chunk_files(self, java_files: Dict[str, str]) -> List[Dict[str, str]]:
-        """Group Java files into chunks without splitting individual files."""
-        chunks: List[Dict[str, str]] = []
-        current_chunk: Dict[str, str] = {}
+    def chunk_files(
+        self, java_files: Mapping[str, str], max_chars: int | None = None, max_files: int | None = None
+    ) -> List[SourceSet]:
+        """Group Java files into chunks without splitting individual files.
+
+        Chunks are views over the project's SourceSet, so grouping and truncation copy no
+        source text; sizes and limits are measured in UTF-8 bytes. ``max_files`` caps the
+        files per chunk when each file adds to the answer, e.g. for summary calls.
+        """
+        source = SourceSet.from_files(java_files)
+        chunks: List[SourceSet] = []
+        current_paths: List[str] = []
+        limits: Dict[str, int] = {}
         current_len = 0
-        limit = self.max_chars
-
-        for path, content in java_files.items():
-            normalized_content = content
-            if len(normalized_content) > limit:
-                normalized_content = (
-                    normalized_content[:limit]
-                    + "\n\n[FILE TRUNCATED DUE TO SIZE]"
-                )
-
-            file_length = len(normalized_content)
-            if current_len + file_length > limit and current_chunk:
-                chunks.append(current_chunk)
-                current_chunk = {}
+        limit = max_chars or self.max_chars
+
+        for path in source:
+            file_length = source.size(path)
+            if file_length > limit:
+                limits[path] = limit
+                file_length = limit + len(_TRUNCATED_NOTE)
+            else:
+                file_length += len(source.suffix(path))
+
+            full = current_len + file_length > limit or (max_files is not None and len(current_paths) >= max_files)
+            if full and current_paths:
+                chunks.append(source.select(current_paths, limits, _TRUNCATED_NOTE))
+                current_paths = []
                 current_len = 0
 
-            current_chunk[path] = normalized_content
+            current_paths.append(path)
             current_len += file_length
 
-        if current_chunk:
-            chunks.append(current_chunk)
+        if current_paths:
+            chunks.append(source.select(current_paths, limits, _TRUNCATED_NOTE))
 
         return chunks
+
+    def rank_chunks(self, chunks: List[SourceSet]) -> List[SourceSet]:
+        """Order chunks by likely pattern signal, strongest first."""
+        return sorted(chunks, key=self._signal_score, reverse=True)
+
+    @staticmethod
+    def _signal_score(chunk: SourceSet) -> float:
+        """Score a chunk by abstraction density and presence of the entry-point class."""
+        total_chars = chunk.nbytes or 1
+        abstractions = sum(len(_ABSTRACTION_RE.findall(chunk.view(path))) for path in chunk)
+        score = abstractions * 1000 / total_chars
+
+        for path in chunk:
+            stem = path.rsplit("/", 1)[-1].removesuffix(".java")
+            if stem in _ENTRY_POINT_NAMES or _MAIN_METHOD_RE.search(chunk.view(path)):
+                score += 10
+                break
+        return score
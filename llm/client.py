@@ -1,13 +1,80 @@
 import logging
-from typing import List
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List
 
 import requests
 from fastapi import HTTPException
 
 from config import settings
+from llm.cancellation import (
+    CANCEL_EARLY_EXIT,
+    CancellableAdapter,
+    CancelScope,
+    ScopeCancelled,
+    cancel_scope,
+    cancellation_stats,
+)
+from llm.scheduler import Priority, get_scheduler
+from utils.admission import admission_controller
+from utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
+_TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+_OVERFLOW_MARKERS = ("context length", "context window", "context size", "n_ctx", "too many tokens", "maximum context")
+
+
+class LLMError(HTTPException):
+    """An LM Studio call failed; surfaces to API clients as a 502 unless handled."""
+
+    def __init__(self, detail: str, status_code: int = 502) -> None:
+        """Initialize the error with the client-facing detail."""
+        super().__init__(status_code=status_code, detail=detail)
+
+
+class LLMTransientError(LLMError):
+    """A failure that may succeed when retried unchanged (connection error, 429 or 5xx)."""
+
+
+class LLMTimeoutError(LLMError):
+    """The call exceeded LLM_TIMEOUT; a smaller prompt may succeed."""
+
+
+class LLMContextOverflowError(LLMError):
+    """The prompt plus requested output exceeded the model's context window."""
+
+
+class LLMCancelledError(LLMError):
+    """The call's cancel scope was cancelled (client disconnect or early exit), so it was not sent or was aborted."""
+
+    def __init__(self, detail: str = "Request cancelled: the client disconnected.") -> None:
+        """Initialize the error with the non-standard 499 Client Closed Request status."""
+        super().__init__(detail, status_code=499)
+
+
+@dataclass
+class LLMResult:
+    """Completion text with the token usage of the call that produced it."""
+
+    content: str
+    prompt_tokens: int
+    completion_tokens: int
+    usage_estimated: bool = False
+    service_seconds: float | None = None  # time the server took to answer, excluding queueing and retries
+
+    @property
+    def total_tokens(self) -> int:
+        """Return prompt plus completion tokens."""
+        return self.prompt_tokens + self.completion_tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the token count of a string when the server reports no usage."""
+    return max(1, int(len(text) / settings.CHARS_PER_TOKEN))
+
 
 class OllamaClient:
     """HTTP client for interacting with a local LM Studio server (OpenAI-compatible API)."""
@@ -15,53 +82,106 @@ class OllamaClient:
     def __init__(self, base_url: str | None = None) -> None:
         """Initialize the client with an optional custom base URL."""
         self.base_url = base_url or settings.OLLAMA_BASE_URL.rstrip("/")
+        self.scheduler = get_scheduler(self.base_url)
+        # A shared session reuses connections; its adapter lets a CancelScope abort pending responses.
+        self.session = requests.Session()
+        adapter = CancellableAdapter(pool_maxsize=max(10, settings.LLM_MAX_CONCURRENT_PER_BACKEND * 2))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.usage_counts: Counter = Counter()
+        self.last_used: Dict[str, float] = {}
+        self._usage_lock = threading.Lock()
+
+    def most_used_models(self, limit: int) -> List[str]:
+        """Return the models this client has called most often."""
+        with self._usage_lock:
+            return [model for model, _ in self.usage_counts.most_common(limit)]
 
-    def generate(self, prompt: str, model: str) -> str:
-        """Generate text from the LM Studio model using the OpenAI-compatible chat endpoint."""
+    def complete(self, prompt: str, model: str, max_tokens: int | None = None) -> LLMResult:
+        """Generate text and return it with the prompt and completion token counts."""
         url = f"{self.base_url}/v1/chat/completions"
+        with self._usage_lock:
+            self.usage_counts[model] += 1
+            self.last_used[model] = time.monotonic()
         payload = {
             "model": model,
             "messages": [{"role": "user", "content": prompt}],
             "stream": False,
             "temperature": settings.LLM_TEMPERATURE,
-            "max_tokens": settings.NUM_CTX,
+            "max_tokens": max_tokens or settings.NUM_CTX,
         }
-        logger.info("Sending request to LM Studio: model=%s, prompt_chars=%d", model, len(prompt))
+        scope = cancel_scope.get()
+        if scope is not None and scope.cancelled:
+            raise self._cancelled(prompt, payload["max_tokens"], sent=False, scope=scope)
+        logger.info("Sending request to LM Studio: model=%s, prompt_chars=%d, max_tokens=%d", model, len(prompt), payload["max_tokens"])
         try:
-            response = requests.post(url, json=payload, timeout=settings.LLM_TIMEOUT)
+            with self.scheduler.slot(cost=estimate_tokens(prompt) + payload["max_tokens"]) as queued:
+                if scope is not None and scope.cancelled:
+                    raise self._cancelled(prompt, payload["max_tokens"], sent=False, scope=scope)
+                with span("llm.generate", model=model, prompt_chars=len(prompt)) as attrs:
+                    attrs["queue_ms"] = round(queued * 1000, 1)
+                    started = time.perf_counter()
+                    response = self.session.post(url, json=payload, timeout=settings.LLM_TIMEOUT)
+                    service_seconds = time.perf_counter() - started
+                    admission_controller.record_call(service_seconds)
+        except ScopeCancelled as exc:
+            raise self._cancelled(prompt, payload["max_tokens"], sent=False, scope=scope) from exc
         except requests.exceptions.Timeout as exc:
+            admission_controller.record_call(settings.LLM_TIMEOUT)
             logger.error("LM Studio request timed out after %ds (model=%s, prompt_chars=%d)", settings.LLM_TIMEOUT, model, len(prompt))
-            raise HTTPException(
-                status_code=502,
-                detail=f"LM Studio timed out after {settings.LLM_TIMEOUT}s. Try a smaller file set or increase LLM_TIMEOUT.",
+            raise LLMTimeoutError(
+                f"LM Studio timed out after {settings.LLM_TIMEOUT}s. Try a smaller file set or increase LLM_TIMEOUT."
             ) from exc
         except requests.exceptions.RequestException as exc:
+            if scope is not None and scope.cancelled:
+                raise self._cancelled(prompt, payload["max_tokens"], sent=True, scope=scope) from exc
             logger.error("LM Studio connection error: %s", exc)
-            raise HTTPException(
-                status_code=502,
-                detail="LM Studio is unreachable. Please ensure the server is running.",
+            raise LLMTransientError(
+                "LM Studio is unreachable. Please ensure the server is running."
             ) from exc
 
         if not response.ok:
             logger.error("LM Studio returned HTTP %d: %s", response.status_code, response.text[:500])
-            raise HTTPException(
-                status_code=502,
-                detail=f"LM Studio returned status {response.status_code}: {response.text}",
-            )
+            detail = f"LM Studio returned status {response.status_code}: {response.text}"
+            if response.status_code in _TRANSIENT_STATUSES:
+                raise LLMTransientError(detail)
+            if any(marker in response.text.lower() for marker in _OVERFLOW_MARKERS):
+                raise LLMContextOverflowError(detail)
+            raise LLMError(detail)
 
+        # A garbled answer is usually a one-off from a busy server, so it is retried like a 5xx.
         try:
             data = response.json()
         except ValueError as exc:
-            raise HTTPException(
-                status_code=500, detail="Malformed response from LM Studio."
-            ) from exc
+            logger.error("LM Studio returned a malformed response: %s", response.text[:500])
+            raise LLMTransientError("Malformed response from LM Studio.") from exc
 
         try:
-            return str(data["choices"][0]["message"]["content"])
-        except (KeyError, IndexError) as exc:
-            raise HTTPException(
-                status_code=500, detail="Missing response content from LM Studio."
-            ) from exc
+            content = str(data["choices"][0]["message"]["content"])
+        except (KeyError, IndexError, TypeError) as exc:
+            logger.error("LM Studio response has no content: %s", response.text[:500])
+            raise LLMTransientError("Missing response content from LM Studio.") from exc
+
+        usage = data.get("usage") or {}
+        result = LLMResult(
+            content=content,
+            prompt_tokens=int(usage.get("prompt_tokens") or estimate_tokens(prompt)),
+            completion_tokens=int(usage.get("completion_tokens") or estimate_tokens(content)),
+            usage_estimated=not usage,
+            service_seconds=service_seconds,
+        )
+        attrs.update(prompt_tokens=result.prompt_tokens, completion_tokens=result.completion_tokens)
+        logger.info("LM Studio usage: prompt_tokens=%d, completion_tokens=%d%s", result.prompt_tokens, result.completion_tokens, " (estimated)" if result.usage_estimated else "")
+        return result
+
+    @staticmethod
+    def _cancelled(prompt: str, max_tokens: int, sent: bool, scope: CancelScope) -> LLMCancelledError:
+        """Count a call dropped because its scope was cancelled and return the error to raise."""
+        # An aborted call was already prefilled, so only its output is saved; max_tokens bounds it.
+        tokens_saved = max_tokens if sent else estimate_tokens(prompt) + max_tokens
+        cancellation_stats.record_call(sent, tokens_saved, early_exit=scope.reason == CANCEL_EARLY_EXIT)
+        logger.info("LLM call %s: %s (~%d tokens saved)", "aborted" if sent else "skipped", scope.reason, tokens_saved)
+        return LLMCancelledError("LLM call cancelled.")
 
     def list_models(self) -> List[str]:
         """Return a list of available models from the LM Studio server."""
@@ -78,6 +198,50 @@ class OllamaClient:
         except ValueError:
             return []
 
+    def get_context_length(self, model: str) -> int | None:
+        """Return the context length the server reports for a model, or None if unknown."""
+        # LM Studio's native REST API exposes loaded/max context; the OpenAI-compatible one may not.
+        try:
+            response = requests.get(f"{self.base_url}/api/v0/models/{model}", timeout=5)
+            if response.ok:
+                data = response.json()
+                for key in ("loaded_context_length", "max_context_length"):
+                    if data.get(key):
+                        return int(data[key])
+        except (requests.exceptions.RequestException, ValueError, TypeError):
+            pass
+
+        try:
+            response = requests.get(f"{self.base_url}/v1/models", timeout=5)
+            if not response.ok:
+                return None
+            for entry in response.json().get("data", []):
+                if entry.get("id") != model:
+                    continue
+                for key in ("context_length", "max_context_length", "context_window"):
+                    if entry.get(key):
+                        return int(entry[key])
+        except (requests.exceptions.RequestException, ValueError, TypeError):
+            return None
+        return None
+
+    def warm_up(self, model: str) -> float:
+        """Send a one-token generation so the model's weights load, returning the elapsed seconds.
+
+        Warm-up calls are not counted as model usage.
+        """
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": "ping"}],
+            "stream": False,
+            "max_tokens": 1,
+        }
+        with self.scheduler.slot(cost=1, priority=Priority.BULK, client="warmup"):
+            started = time.perf_counter()
+            response = requests.post(f"{self.base_url}/v1/chat/completions", json=payload, timeout=settings.LLM_TIMEOUT)
+        response.raise_for_status()
+        return time.perf_counter() - started
+
     def is_running(self) -> bool:
         """Check whether the LM Studio server is reachable."""
         try:
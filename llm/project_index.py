@@ -0,0 +1,175 @@
+import hashlib
+import random
+import re
+import sqlite3
+import threading
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Mapping, Set
+
+from config import settings
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_TYPE_RE = re.compile(
+    r"\b(class|interface|enum|record)\s+(\w+)([^{;]*)\{",
+)
+_METHOD_RE = re.compile(
+    r"^\s*((?:(?:public|protected|private|abstract|final|static|synchronized|default)\s+)*)"
+    r"([\w<>\[\],.? ]+?)\s+(\w+)\s*\(([^)]*)\)",
+    re.MULTILINE,
+)
+_FIELD_RE = re.compile(
+    r"^\s*((?:(?:public|protected|private|final|static)\s+)+)([\w<>\[\],.? ]+?)\s+\w+\s*[;=]",
+    re.MULTILINE,
+)
+_NOT_METHODS = {"if", "for", "while", "switch", "catch", "return", "new", "else", "throw"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    signature   BLOB NOT NULL,
+    analysis    TEXT NOT NULL,
+    created_at  REAL NOT NULL DEFAULT (julianday('now'))
+);
+CREATE TABLE IF NOT EXISTS bands (
+    bucket      INTEGER NOT NULL,
+    project_id  INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_bands_bucket ON bands(bucket);
+"""
+
+
+@dataclass
+class SimilarProject:
+    """A previously analyzed project whose structure resembles the current one."""
+
+    project_id: int
+    similarity: float
+    analysis: str
+
+
+def _normalize(text: str) -> str:
+    return " ".join(re.sub(r"\s*([<>,\[\]])\s*", r"\1", text).split())
+
+
+def signature_shingles(java_files: Mapping[str, str]) -> Set[str]:
+    """Return class-signature shingles: type headers plus the member signatures of each type.
+
+    Package names, file paths, bodies and parameter names are ignored so that forks and
+    renamed copies of a project produce mostly the same shingles.
+    """
+    shingles: Set[str] = set()
+    for content in java_files.values():
+        types = list(_TYPE_RE.finditer(content))
+        for idx, match in enumerate(types):
+            kind, name, header = match.groups()
+            shingles.add(_normalize(f"{kind} {name} {header}"))
+            end = types[idx + 1].start() if idx + 1 < len(types) else len(content)
+            body = content[match.end():end]
+            for member in _METHOD_RE.finditer(body):
+                modifiers, returns, method, params = member.groups()
+                if method in _NOT_METHODS or returns.strip() in _NOT_METHODS:
+                    continue
+                param_types = ",".join(p.strip().rsplit(" ", 1)[0] for p in params.split(",") if p.strip())
+                shingles.add(_normalize(f"{name}::{modifiers}{returns} {method}({param_types})"))
+            for member in _FIELD_RE.finditer(body):
+                shingles.add(_normalize(f"{name}::{member.group(1)}{member.group(2)}"))
+    return shingles
+
+
+class ProjectIndex:
+    """MinHash/LSH index of analyzed projects, persisted in a local SQLite file.
+
+    Each project is reduced to a MinHash signature of its class-signature shingles. The
+    signature is split into bands; projects sharing any band bucket are candidates, and
+    candidates are ranked by the Jaccard similarity their signatures estimate.
+    """
+
+    def __init__(self, path: str | None = None) -> None:
+        """Set up the hash family; the SQLite file is opened on first use."""
+        self.path = Path(path or settings.SIMILARITY_INDEX_PATH)
+        self.num_perm = settings.SIMILARITY_NUM_PERM
+        self.bands = settings.SIMILARITY_BANDS
+        self.rows = self.num_perm // self.bands
+        rng = random.Random(0x5EED)
+        self._coefficients = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(self.num_perm)
+        ]
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def signature(self, java_files: Mapping[str, str]) -> List[int] | None:
+        """Return the MinHash signature of a project, or None when it has no declarations."""
+        shingles = signature_shingles(java_files)
+        if not shingles:
+            return None
+        hashes = [
+            int.from_bytes(hashlib.blake2b(s.encode("utf-8", "surrogatepass"), digest_size=8).digest(), "big")
+            for s in shingles
+        ]
+        return [
+            min((a * h + b) % _MERSENNE_PRIME for h in hashes) & _MAX_HASH
+            for a, b in self._coefficients
+        ]
+
+    def lookup(self, signature: List[int], namespace: str, min_similarity: float) -> SimilarProject | None:
+        """Return the most similar indexed project at or above the threshold, if any."""
+        buckets = self._buckets(signature, namespace)
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute(
+                "SELECT DISTINCT p.id, p.signature FROM bands b JOIN projects p ON p.id = b.project_id "
+                f"WHERE b.bucket IN ({','.join('?' * len(buckets))})",
+                buckets,
+            ).fetchall()
+            best_id, best_similarity = None, 0.0
+            for project_id, blob in rows:
+                similarity = self._similarity(signature, array("I", blob))
+                if similarity > best_similarity:
+                    best_id, best_similarity = project_id, similarity
+            if best_id is None or best_similarity < min_similarity:
+                return None
+            analysis = conn.execute("SELECT analysis FROM projects WHERE id = ?", (best_id,)).fetchone()[0]
+        return SimilarProject(best_id, round(best_similarity, 3), analysis)
+
+    def add(self, signature: List[int], namespace: str, analysis: str) -> int:
+        """Index a project's signature with the analysis it produced and return its id."""
+        buckets = self._buckets(signature, namespace)
+        with self._lock:
+            conn = self._connection()
+            cursor = conn.execute(
+                "INSERT INTO projects (signature, analysis) VALUES (?, ?)",
+                (array("I", signature).tobytes(), analysis),
+            )
+            project_id = int(cursor.lastrowid)
+            conn.executemany(
+                "INSERT INTO bands (bucket, project_id) VALUES (?, ?)", [(bucket, project_id) for bucket in buckets]
+            )
+            conn.commit()
+        return project_id
+
+    def _buckets(self, signature: List[int], namespace: str) -> List[int]:
+        """Hash each band, scoped by namespace (model and prompt version), to a signed 64-bit bucket."""
+        buckets = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows]
+            digest = hashlib.blake2b(f"{namespace}|{band}|{rows}".encode(), digest_size=8).digest()
+            buckets.append(int.from_bytes(digest, "big", signed=True))
+        return buckets
+
+    @staticmethod
+    def _similarity(left: List[int], right: array) -> float:
+        """Estimate Jaccard similarity as the share of matching signature slots."""
+        return sum(1 for a, b in zip(left, right) if a == b) / len(left)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened lazily so importing the service does not touch the disk; guarded by self._lock.
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA foreign_keys = ON")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
@@ -0,0 +1,161 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Dict, Iterator, List
+
+from config import settings
+from llm.cancellation import CancelScope, ScopeCancelled, cancel_scope
+
+
+class Priority(IntEnum):
+    """Scheduling class of an LLM call; lower values are served first."""
+
+    INTERACTIVE = 0
+    BULK = 1
+
+
+# Set by the routes so every LLM call made while handling a request inherits them.
+request_priority: ContextVar[Priority] = ContextVar("request_priority", default=Priority.BULK)
+request_client: ContextVar[str] = ContextVar("request_client", default="anonymous")
+
+
+@dataclass(order=True)
+class _Ticket:
+    priority: int
+    start_tag: float
+    seq: int
+    client: str = field(compare=False)
+    finish_tag: float = field(compare=False)
+    enqueued: float = field(compare=False, default_factory=time.monotonic)
+
+
+class LLMScheduler:
+    """Gate calls to one backend: strict priority between classes, weighted fair queuing between clients.
+
+    Within a priority class, start-time fair queuing orders calls by virtual start tag, so a
+    client's share of the backend follows its weight (CLIENT_WEIGHTS) and the estimated token
+    cost of its calls rather than how many calls it submits.
+    """
+
+    def __init__(self, max_concurrent: int | None = None) -> None:
+        """Initialize the scheduler with a cap on concurrent calls to the backend."""
+        self.max_concurrent = max_concurrent or settings.LLM_MAX_CONCURRENT_PER_BACKEND
+        self.active = 0
+        self._heap: List[_Ticket] = []
+        self._seq = itertools.count()
+        self._virtual_time: Dict[int, float] = {}
+        self._last_finish: Dict[tuple, float] = {}
+        self._waits: Dict[int, List[float]] = {int(p): [] for p in Priority}
+        self._cond = threading.Condition()
+
+    def acquire(self, cost: float, priority: Priority | None = None, client: str | None = None) -> float:
+        """Block until the call may run and return the seconds spent queued.
+
+        Raises ScopeCancelled, leaving the queue, if the caller's cancel scope is cancelled while waiting.
+        """
+        priority = request_priority.get() if priority is None else priority
+        client = request_client.get() if client is None else client
+        weight = settings.CLIENT_WEIGHTS.get(client, 1.0)
+        scope = cancel_scope.get()
+        if scope is not None:
+            scope.subscribe(self._wake)
+        try:
+            return self._acquire(cost, priority, client, weight, scope)
+        finally:
+            if scope is not None:
+                scope.unsubscribe(self._wake)
+
+    def _acquire(
+        self, cost: float, priority: Priority, client: str, weight: float, scope: CancelScope | None
+    ) -> float:
+        """Queue a ticket and wait for a free slot, leaving the queue if the scope is cancelled."""
+        with self._cond:
+            now_v = self._virtual_time.get(priority, 0.0)
+            previous_finish = self._last_finish.get((priority, client), 0.0)
+            start = max(now_v, previous_finish)
+            finish = start + max(cost, 1.0) / weight
+            self._last_finish[(priority, client)] = finish
+            if len(self._last_finish) > 1000:
+                # Clients whose last call is already behind virtual time would not be delayed anyway.
+                self._last_finish = {
+                    key: tag for key, tag in self._last_finish.items()
+                    if tag > self._virtual_time.get(key[0], 0.0)
+                }
+            ticket = _Ticket(int(priority), start, next(self._seq), client, finish)
+            heapq.heappush(self._heap, ticket)
+
+            while self.active >= self.max_concurrent or self._heap[0] is not ticket:
+                if scope is not None and scope.cancelled:
+                    self._heap.remove(ticket)
+                    heapq.heapify(self._heap)
+                    # The call never ran, so it should not count against the client's fair share.
+                    if self._last_finish.get((priority, client)) == finish:
+                        self._last_finish[(priority, client)] = previous_finish
+                    self._cond.notify_all()
+                    raise ScopeCancelled()
+                self._cond.wait()
+
+            heapq.heappop(self._heap)
+            self.active += 1
+            self._virtual_time[priority] = max(self._virtual_time.get(priority, 0.0), ticket.start_tag)
+            waited = time.monotonic() - ticket.enqueued
+            waits = self._waits[int(priority)]
+            waits.append(waited)
+            del waits[:-200]
+            # Let the next ticket re-check in case a slot is still free.
+            self._cond.notify_all()
+            return waited
+
+    def _wake(self) -> None:
+        """Wake waiting callers so they re-check their cancel scopes."""
+        with self._cond:
+            self._cond.notify_all()
+
+    def release(self) -> None:
+        """Free a slot and wake waiting callers."""
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, cost: float, priority: Priority | None = None, client: str | None = None) -> Iterator[float]:
+        """Hold a backend slot for the duration of the block; yields the queue wait in seconds."""
+        waited = self.acquire(cost, priority, client)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    def snapshot(self) -> dict:
+        """Return active calls, queue depth per class, and recent p95 queue wait."""
+        with self._cond:
+            queued = {p.name.lower(): 0 for p in Priority}
+            for ticket in self._heap:
+                queued[Priority(ticket.priority).name.lower()] += 1
+            p95 = {}
+            for p in Priority:
+                waits = sorted(self._waits[int(p)])
+                p95[p.name.lower()] = round(waits[int(0.95 * (len(waits) - 1))] * 1000, 1) if waits else None
+            return {
+                "active": self.active,
+                "max_concurrent": self.max_concurrent,
+                "queued": queued,
+                "p95_queue_wait_ms": p95,
+            }
+
+
+_schedulers: Dict[str, LLMScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(base_url: str) -> LLMScheduler:
+    """Return the shared scheduler for a backend, creating it on first use."""
+    with _schedulers_lock:
+        if base_url not in _schedulers:
+            _schedulers[base_url] = LLMScheduler()
+        return _schedulers[base_url]
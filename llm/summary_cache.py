@@ -0,0 +1,108 @@
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable
+
+from config import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    key         TEXT PRIMARY KEY,
+    summary     TEXT NOT NULL,
+    created_at  REAL NOT NULL DEFAULT (julianday('now'))
+);
+"""
+
+
+class SummaryCache:
+    """Two-tier cache of per-file summaries: an in-memory LRU in front of a local SQLite table.
+
+    Entries are keyed by a hash of the file content, the model and the summary prompt
+    version, so identical files are summarized once across projects and uploads.
+    """
+
+    def __init__(self, path: str | None = None, memory_entries: int | None = None) -> None:
+        """Open (and create if needed) the on-disk tier and an empty memory tier."""
+        self.path = Path(path or settings.SUMMARY_CACHE_PATH)
+        self.memory_entries = memory_entries or settings.SUMMARY_CACHE_MEMORY_ENTRIES
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(content: str | bytes | memoryview, model: str, prompt_version: str) -> str:
+        """Return the cache key of a file's summary; content may be given as its UTF-8 bytes."""
+        digest = hashlib.sha256()
+        for part in (prompt_version, model, content):
+            digest.update(part.encode("utf-8", "surrogatepass") if isinstance(part, str) else part)
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Return the cached summaries among the given keys, promoting disk hits to memory."""
+        found: Dict[str, str] = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                    self.memory_hits += 1
+                else:
+                    missing.append(key)
+
+            if missing:
+                conn = self._connection()
+                for start in range(0, len(missing), 500):
+                    batch = missing[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT key, summary FROM summaries WHERE key IN ({','.join('?' * len(batch))})", batch
+                    ).fetchall()
+                    for key, summary in rows:
+                        found[key] = summary
+                        self._remember(key, summary)
+                        self.disk_hits += 1
+                self.misses += len(missing) - sum(1 for key in missing if key in found)
+        return found
+
+    def put_many(self, summaries: Dict[str, str]) -> None:
+        """Store summaries in both tiers."""
+        if not summaries:
+            return
+        with self._lock:
+            for key, summary in summaries.items():
+                self._remember(key, summary)
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO summaries (key, summary) VALUES (?, ?)", summaries.items()
+            )
+            conn.commit()
+
+    def stats(self) -> dict:
+        """Return hit and miss counters for each tier."""
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+    def _remember(self, key: str, summary: str) -> None:
+        self._memory[key] = summary
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened lazily so importing the service does not touch the disk; guarded by self._lock.
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.executescript(_SCHEMA)
+        return self._conn
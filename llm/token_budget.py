@@ -0,0 +1,60 @@
+import threading
+
+from config import settings
+from llm.client import estimate_tokens
+
+
+class TokenBudget:
+    """Track token spend of one request against an optional total budget."""
+
+    def __init__(self, total: int | None = None) -> None:
+        """Initialize the budget; None means unlimited."""
+        self.total = total
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._reserved = 0
+        self._lock = threading.Lock()
+
+    @property
+    def used(self) -> int:
+        """Return tokens actually spent so far."""
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def remaining(self) -> int | None:
+        """Return tokens neither spent nor reserved, or None when unlimited."""
+        if self.total is None:
+            return None
+        with self._lock:
+            return self.total - self.used - self._reserved
+
+    def reserve(self, prompt: str, max_output: int, hold_back: int = 0) -> int | None:
+        """Reserve room for a call and return the output cap to request, or None to skip it.
+
+        ``hold_back`` tokens stay unreserved for work that must run later, such as the merge.
+        """
+        if self.total is None:
+            return max_output
+        prompt_estimate = estimate_tokens(prompt)
+        with self._lock:
+            available = self.total - self.used - self._reserved - hold_back - prompt_estimate
+            if available < settings.MIN_OUTPUT_TOKENS:
+                return None
+            granted = min(max_output, available)
+            self._reserved += prompt_estimate + granted
+            return granted
+
+    def settle(self, prompt: str, granted: int, prompt_tokens: int, completion_tokens: int) -> None:
+        """Release a reservation and record the call's actual usage."""
+        with self._lock:
+            if self.total is not None:
+                self._reserved -= estimate_tokens(prompt) + granted
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+    def release(self, prompt: str, granted: int) -> None:
+        """Drop a reservation for a call that never completed."""
+        if self.total is None:
+            return
+        with self._lock:
+            self._reserved -= estimate_tokens(prompt) + granted
@@ -1,37 +1,88 @@
 import logging
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from config import settings
+from utils.tracing import RequestIdFilter, request_id_from_header, start_trace, trace_store
 
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    format="%(asctime)s [%(levelname)s] [%(request_id)s] %(name)s: %(message)s",
 )
+for handler in logging.getLogger().handlers:
+    handler.addFilter(RequestIdFilter())
 from routes.analyze import router as analyze_router
+from routes.analyze import warmup_service
+from routes.debug import router as debug_router
 from routes.models import router as models_router
 from llm.client import OllamaClient
+from llm.scheduler import request_client
+from utils.admission import admission_controller
 
 
-app = FastAPI(title="Java Design Pattern Analyzer")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Print startup information and keep configured models warm while the app runs."""
+    ollama = OllamaClient()
+    status = "RUNNING" if ollama.is_running() else "NOT RUNNING"
+    print("Backend running at http://localhost:8000")
+    print(f"Ollama status: {status}")
+    print(f"Default model: {settings.DEFAULT_MODEL}")
+    warmup_service.start()
+    yield
+    await warmup_service.stop()
+
+
+app = FastAPI(title="Java Design Pattern Analyzer", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://127.0.0.1:5500"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "Server-Timing"],
 )
 
 app.include_router(analyze_router)
 app.include_router(models_router)
+app.include_router(debug_router)
 
+logger = logging.getLogger(__name__)
 
-@app.on_event("startup")
-def startup_event() -> None:
-    """Print startup information including Ollama status and default model."""
-    ollama = OllamaClient()
-    status = "RUNNING" if ollama.is_running() else "NOT RUNNING"
-    print("Backend running at http://localhost:8000")
-    print(f"Ollama status: {status}")
-    print(f"Default model: {settings.DEFAULT_MODEL}")
+
+_UPLOAD_PATHS = {"/analyze", "/analyze-folder"}
+
+
+@app.middleware("http")
+async def guard_uploads(request: Request, call_next):
+    """Reject analysis uploads that are too large or cannot be admitted before Starlette spools the body."""
+    if request.method == "POST" and request.url.path in _UPLOAD_PATHS:
+        content_length = request.headers.get("content-length")
+        if content_length is None or not content_length.isdigit():
+            return JSONResponse(status_code=411, content={"detail": "Uploads must declare a Content-Length."})
+        limit = settings.MAX_FILE_SIZE_MB * 1024 * 1024 + settings.MULTIPART_OVERHEAD_KB * 1024
+        if int(content_length) > limit:
+            return JSONResponse(status_code=413, content={"detail": f"Upload exceeds {settings.MAX_FILE_SIZE_MB} MB."})
+        try:
+            admission_controller.check_capacity()
+        except HTTPException as exc:
+            return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail}, headers=exc.headers)
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Assign a correlation id, trace the request, and return the id in X-Request-ID."""
+    request_id = request_id_from_header(request.headers.get("X-Request-ID"))
+    trace = start_trace(request_id, profile_requested=request.headers.get("X-Profile") == "1")
+    request_client.set(request.headers.get("X-Client-ID") or (request.client.host if request.client else "anonymous"))
+    response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    if trace.spans or trace.profile_path:
+        response.headers["Server-Timing"] = trace.server_timing()
+        trace_store.put(trace)
+    logger.info("%s %s -> %d in %.1f ms", request.method, request.url.path, response.status_code, trace.elapsed_ms())
+    return response
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 
@@ -5,12 +7,14 @@ class AnalyzeZipRequest(BaseModel):
     """Request model for analyzing a zipped Java project."""
 
     model: str = "qwen3-coder-30b-a3b-instruct"
+    token_budget: Optional[int] = None
 
 
 class AnalyzeFolderRequest(BaseModel):
     """Request model for analyzing uploaded Java source files."""
 
     model: str = "qwen3-coder-30b-a3b-instruct"
+    token_budget: Optional[int] = None
 
 
 class GenerateRequest(BaseModel):
@@ -19,6 +23,7 @@ class GenerateRequest(BaseModel):
     pattern: str
     description: str
     model: str = "qwen3-coder-30b-a3b-instruct"
+    token_budget: Optional[int] = None
 
 
 class FollowUpRequest(BaseModel):
@@ -27,3 +32,4 @@ class FollowUpRequest(BaseModel):
     analysis: str
     question: str
     model: str = "qwen3-coder-30b-a3b-instruct"
+    token_budget: Optional[int] = None
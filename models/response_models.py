@@ -12,6 +12,20 @@ class AnalysisResponse(BaseModel):
     folder_structure: dict
     raw_analysis: str
     chunks_used: int
+    chunk_char_budget: Optional[int] = None
+    chunks_skipped: int = 0
+    latency_saved_ms: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    token_budget: Optional[int] = None
+    files_covered: List[str] = []
+    files_retried: List[str] = []
+    files_skipped: List[str] = []
+    summary_cache_hits: int = 0
+    summaries_generated: int = 0
+    reused: bool = False
+    similar_project_id: Optional[int] = None
+    similarity: Optional[float] = None
     error: Optional[str] = None
 
 
@@ -29,6 +43,8 @@ class GenerateResponse(BaseModel):
     pattern: str
     description: str
     files: List[GeneratedFile]
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
     error: Optional[str] = None
 
 
@@ -38,4 +54,6 @@ class FollowUpResponse(BaseModel):
     model_used: str
     question: str
     answer: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
     error: Optional[str] = None
@@ -1,14 +1,27 @@
-from typing import List
+import asyncio
+import logging
+from typing import Any, Callable, List, Optional
 
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
 
 from config import settings
-from llm.client import OllamaClient
+from llm.cancellation import CancelScope, cancel_scope, cancellation_stats
+from llm.client import LLMCancelledError, LLMResult, OllamaClient
+from llm.scheduler import Priority, request_priority
+from llm.token_budget import TokenBudget
 from models.request_models import FollowUpRequest, GenerateRequest
 from models.response_models import AnalysisResponse, FollowUpResponse, GenerateResponse
 from services.analysis_service import AnalysisService
 from services.file_service import FileService
 from services.prompt_service import PromptService
+from services.warmup_service import WarmupService
+from utils.admission import admission_controller
+from utils.memory_budget import memory_budget
+from utils.source_set import SourceSet
+from utils.tracing import profile_request, span
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -16,40 +29,124 @@ file_service = FileService()
 ollama_client = OllamaClient()
 prompt_service = PromptService()
 analysis_service = AnalysisService(file_service=file_service, ollama_client=ollama_client)
+warmup_service = WarmupService(ollama_client=ollama_client)
 
 
 @router.post("/analyze", response_model=AnalysisResponse)
-async def analyze_zip(file: UploadFile = File(...), model: str = Form(settings.DEFAULT_MODEL)):
+async def analyze_zip(
+    http_request: Request,
+    file: UploadFile = File(...),
+    model: str = Form(settings.DEFAULT_MODEL),
+    early_exit: bool = Form(settings.EARLY_EXIT_ENABLED),
+    token_budget: Optional[int] = Form(None),
+    hierarchical: bool = Form(settings.HIERARCHICAL_ANALYSIS),
+    reuse_similar: bool = Form(settings.SIMILARITY_INDEX_ENABLED),
+):
     """Analyze a zipped Java project and return design pattern findings."""
     if not file.filename.lower().endswith(".zip"):
         raise HTTPException(status_code=400, detail="Only .zip files are accepted.")
 
-    if not ollama_client.is_running():
+    if not await run_in_threadpool(ollama_client.is_running):
         raise HTTPException(status_code=503, detail="Ollama server is not running.")
 
-    saved_path = None
-    extracted_path = None
-    try:
-        contents = await file.read()
-        saved_path = file_service.save_upload(contents, file.filename)
-        extracted_path = file_service.extract_zip(saved_path)
-        java_files = file_service.walk_java_files(extracted_path)
-        return analysis_service.analyze(java_files, model)
-    finally:
-        file_service.cleanup(saved_path, extracted_path)
+    # Queue capacity was already checked by the guard_uploads middleware, before the body was read.
+    file_service.check_upload_size(file)
+
+    # The zip is read straight from Starlette's spooled upload; archive work runs off the event loop.
+    with span("ingest.upload") as attrs:
+        java_bytes = await run_in_threadpool(file_service.inspect_zip, file.file)
+        attrs["java_bytes"] = java_bytes
+    estimated_calls = await run_in_threadpool(_estimated_calls, java_bytes, model)
+    async with admission_controller.admit(estimated_calls):
+        with memory_budget.reserve(java_bytes):
+            with span("ingest.extract"):
+                java_files = await run_in_threadpool(file_service.read_zip_sources, file.file)
+            return await _run_until_disconnect(
+                http_request,
+                _run_analysis, java_files, model, early_exit, token_budget, hierarchical, reuse_similar,
+            )
 
 
 @router.post("/analyze-folder", response_model=AnalysisResponse)
-async def analyze_folder(files: List[UploadFile] = File(...), model: str = Form(settings.DEFAULT_MODEL)):
+async def analyze_folder(
+    http_request: Request,
+    files: List[UploadFile] = File(...),
+    model: str = Form(settings.DEFAULT_MODEL),
+    early_exit: bool = Form(settings.EARLY_EXIT_ENABLED),
+    token_budget: Optional[int] = Form(None),
+    hierarchical: bool = Form(settings.HIERARCHICAL_ANALYSIS),
+    reuse_similar: bool = Form(settings.SIMILARITY_INDEX_ENABLED),
+):
     """Analyze a collection of uploaded Java source files."""
-    java_files = {}
-    for file in files:
-        if not file.filename.lower().endswith(".java"):
-            continue
-        contents = await file.read()
-        java_files[file.filename] = contents.decode("utf-8", errors="ignore")
+    declared_bytes = sum(
+        file.size or 0 for file in files if file.filename.lower().endswith(".java")
+    )
+    estimated_calls = await run_in_threadpool(_estimated_calls, declared_bytes, model)
+    async with admission_controller.admit(estimated_calls):
+        with memory_budget.reserve(declared_bytes):
+            with span("ingest.upload", java_bytes=declared_bytes):
+                java_files = await file_service.read_java_uploads(files)
+            return await _run_until_disconnect(
+                http_request,
+                _run_analysis, java_files, model, early_exit, token_budget, hierarchical, reuse_similar,
+            )
+
+
+async def _run_until_disconnect(http_request: Request, func: Callable[..., Any], *args: Any) -> Any:
+    """Run blocking LLM work on a worker thread, cancelling it if the client disconnects first."""
+    scope = CancelScope()
+    token = cancel_scope.set(scope)
+    # The worker copies the current context, so its LLM calls see this scope.
+    work = asyncio.ensure_future(run_in_threadpool(func, *args))
+    watcher = asyncio.ensure_future(_wait_for_disconnect(http_request))
+    try:
+        await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if not work.done():
+            aborted = scope.cancel()
+            cancellation_stats.record_abandoned()
+            logger.info("Client disconnected; cancelled outstanding LLM work (%d call(s) aborted)", aborted)
+        try:
+            return await work
+        except Exception as exc:
+            if scope.cancelled:
+                raise LLMCancelledError() from exc
+            raise
+    finally:
+        watcher.cancel()
+        cancel_scope.reset(token)
+
+
+async def _wait_for_disconnect(http_request: Request) -> None:
+    """Return once the client closes the connection; the request body has already been read."""
+    while (await http_request.receive())["type"] != "http.disconnect":
+        pass
 
-    return analysis_service.analyze(java_files, model)
+
+def _estimated_calls(source_bytes: int, model: str) -> int:
+    """Estimate how many LLM calls analyzing this much source will take; may query the server, so run it off the event loop."""
+    return admission_controller.estimate_calls(
+        source_bytes, analysis_service.budget_planner.chars_per_chunk(model)
+    )
+
+
+def _run_analysis(
+    java_files: SourceSet,
+    model: str,
+    early_exit: bool,
+    token_budget: Optional[int],
+    hierarchical: bool,
+    reuse_similar: bool,
+) -> AnalysisResponse:
+    """Run the blocking analysis on a worker thread so the event loop keeps serving requests."""
+    with profile_request():
+        return analysis_service.analyze(
+            java_files,
+            model,
+            early_exit=early_exit,
+            token_budget=token_budget,
+            hierarchical=hierarchical,
+            reuse_similar=reuse_similar,
+        )
 
 
 @router.get("/health")
@@ -59,39 +156,76 @@ def health_check():
         "api": "ok",
         "ollama": ollama_client.is_running(),
         "model": settings.DEFAULT_MODEL,
+        # What the planner currently sizes chunks to for the default model; other models may differ.
+        "chars_per_chunk": analysis_service.budget_planner.chars_per_chunk(settings.DEFAULT_MODEL),
+        "prompt_version": prompt_service.PROMPT_VERSION,
+        "warmup": warmup_service.snapshot(),
+        "scheduler": ollama_client.scheduler.snapshot(),
+        "admission": admission_controller.snapshot(),
+        "cancellation": cancellation_stats.snapshot(),
     }
 
 
 @router.post("/generate", response_model=GenerateResponse)
-def generate_code(request: GenerateRequest):
+async def generate_code(request: GenerateRequest, http_request: Request):
     """Generate Java code that implements a specified design pattern."""
+    request_priority.set(Priority.INTERACTIVE)
+    return await _run_until_disconnect(http_request, _generate, request)
+
+
+def _generate(request: GenerateRequest) -> GenerateResponse:
+    """Build the generate prompt, call the model, and parse the generated files."""
     if not ollama_client.is_running():
         raise HTTPException(status_code=503, detail="Ollama server is not running.")
 
-    prompt = prompt_service.build_generate_prompt(request.pattern, request.description)
-    raw = ollama_client.generate(prompt, request.model)
-    parsed = prompt_service.parse_generated_files(raw)
+    with profile_request():
+        with span("prompt.build"):
+            prompt = prompt_service.build_generate_prompt(request.pattern, request.description)
+        result = _complete_within_budget(prompt, request.model, settings.MAX_TOKENS_GENERATE, request.token_budget)
+        parsed = prompt_service.parse_generated_files(result.content)
 
     return GenerateResponse(
         model_used=request.model,
         pattern=request.pattern,
         description=request.description,
         files=[{"filename": f["filename"], "content": f["content"]} for f in parsed],
+        prompt_tokens=result.prompt_tokens,
+        completion_tokens=result.completion_tokens,
     )
 
 
 @router.post("/followup", response_model=FollowUpResponse)
-def followup(request: FollowUpRequest):
+async def followup(request: FollowUpRequest, http_request: Request):
     """Ask a follow-up question grounded in a prior design pattern analysis."""
+    request_priority.set(Priority.INTERACTIVE)
+    return await _run_until_disconnect(http_request, _followup, request)
+
+
+def _followup(request: FollowUpRequest) -> FollowUpResponse:
+    """Build the follow-up prompt and call the model."""
     if not ollama_client.is_running():
         raise HTTPException(status_code=503, detail="Ollama server is not running.")
 
-    prompt = prompt_service.build_followup_prompt(request.analysis, request.question)
-    answer = ollama_client.generate(prompt, request.model)
+    with profile_request():
+        with span("prompt.build"):
+            prompt = prompt_service.build_followup_prompt(request.analysis, request.question)
+        result = _complete_within_budget(prompt, request.model, settings.MAX_TOKENS_FOLLOWUP, request.token_budget)
 
     return FollowUpResponse(
         model_used=request.model,
         question=request.question,
-        answer=answer,
+        answer=result.content,
+        prompt_tokens=result.prompt_tokens,
+        completion_tokens=result.completion_tokens,
     )
 
+
+def _complete_within_budget(
+    prompt: str, model: str, max_output: int, token_budget: Optional[int]
+) -> LLMResult:
+    """Run a single LLM call with its output capped to the endpoint limit and the request budget."""
+    max_tokens = TokenBudget(token_budget).reserve(prompt, max_output)
+    if max_tokens is None:
+        raise HTTPException(status_code=400, detail="Token budget is too small for this prompt.")
+    return ollama_client.complete(prompt, model, max_tokens=max_tokens)
+
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+
+from utils.tracing import trace_store
+
+router = APIRouter(prefix="/debug")
+
+
+@router.get("/traces/{request_id}")
+def get_trace(request_id: str):
+    """Return the recorded spans of a recent request."""
+    trace = trace_store.get(request_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found or expired.")
+    return trace.to_dict()
+
+
+@router.get("/profiles/{request_id}")
+def get_profile(request_id: str):
+    """Download the cProfile stats captured for a request sent with X-Profile: 1."""
+    trace = trace_store.get(request_id)
+    if trace is None or trace.profile_path is None:
+        raise HTTPException(status_code=404, detail="Profile not found or expired.")
+    return FileResponse(trace.profile_path, media_type="application/octet-stream", filename=f"{request_id}.prof")
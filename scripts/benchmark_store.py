@@ -0,0 +1,302 @@
+"""
+benchmark_store.py
+
+SQLite store of benchmark runs produced by run_test.py, plus a report that
+diffs two runs and flags per-pattern accuracy and p95-latency regressions.
+
+Usage:
+    python scripts/benchmark_store.py list
+    python scripts/benchmark_store.py show 3
+    python scripts/benchmark_store.py report 2 3
+    python scripts/benchmark_store.py import results.json --model qwen3-coder-30b-a3b-instruct
+
+Optional flags:
+    --db                 Path to the SQLite file           (default: benchmarks.sqlite3)
+    --latency-threshold  Relative p95 increase to flag     (default: 0.2)
+    --min-latency-ms     Absolute p95 increase to flag     (default: 500)
+    --json               Print the report as JSON
+"""
+
+import argparse
+import json
+import math
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_DB = ROOT_DIR / "benchmarks.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at      TEXT NOT NULL,
+    model           TEXT NOT NULL,
+    chunk_size      INTEGER,
+    prompt_version  TEXT,
+    config_json     TEXT NOT NULL DEFAULT '{}',
+    notes           TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    id                 INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id             INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    pattern            TEXT NOT NULL,
+    passed             INTEGER NOT NULL,
+    llm_answer         TEXT,
+    error              TEXT,
+    latency_ms         REAL,
+    chunks_used        INTEGER,
+    chunk_char_budget  INTEGER,
+    prompt_tokens      INTEGER,
+    completion_tokens  INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_results_run_pattern ON results(run_id, pattern);
+"""
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Return the nearest-rank percentile of the values, or None when empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class BenchmarkStore:
+    """Persist benchmark runs and per-pattern outcomes in a local SQLite file."""
+
+    def __init__(self, db_path: Path = DEFAULT_DB) -> None:
+        """Open (and create if needed) the store at the given path."""
+        self.conn = sqlite3.connect(str(db_path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(results)")}
+        if "chunk_char_budget" not in columns:
+            # Stores created before per-result chunk budgets were recorded.
+            self.conn.execute("ALTER TABLE results ADD COLUMN chunk_char_budget INTEGER")
+            self.conn.commit()
+
+    def start_run(
+        self,
+        model: str,
+        chunk_size: Optional[int] = None,
+        prompt_version: Optional[str] = None,
+        config: Optional[dict] = None,
+        notes: Optional[str] = None,
+    ) -> int:
+        """Create a run row and return its id."""
+        cursor = self.conn.execute(
+            "INSERT INTO runs (started_at, model, chunk_size, prompt_version, config_json, notes) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                model,
+                chunk_size,
+                prompt_version,
+                json.dumps(config or {}, sort_keys=True),
+                notes,
+            ),
+        )
+        self.conn.commit()
+        return int(cursor.lastrowid)
+
+    def add_result(
+        self,
+        run_id: int,
+        pattern: str,
+        passed: bool,
+        llm_answer: str = "",
+        error: Optional[str] = None,
+        latency_ms: Optional[float] = None,
+        chunks_used: Optional[int] = None,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        chunk_char_budget: Optional[int] = None,
+    ) -> None:
+        """Record one pattern outcome for a run, with the chunk size the analysis actually used."""
+        self.conn.execute(
+            "INSERT INTO results (run_id, pattern, passed, llm_answer, error, latency_ms, chunks_used, chunk_char_budget, "
+            "prompt_tokens, completion_tokens) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                run_id, pattern, int(passed), llm_answer, error, latency_ms, chunks_used, chunk_char_budget,
+                prompt_tokens, completion_tokens,
+            ),
+        )
+        self.conn.commit()
+
+    def set_chunk_size(self, run_id: int, chunk_size: Optional[int]) -> None:
+        """Record the chunk size a run's analyses actually used."""
+        self.conn.execute("UPDATE runs SET chunk_size = ? WHERE id = ?", (chunk_size, run_id))
+        self.conn.commit()
+
+    def runs(self) -> List[sqlite3.Row]:
+        """Return all runs with their aggregate accuracy, newest first."""
+        return self.conn.execute(
+            "SELECT r.*, COUNT(res.id) AS total, COALESCE(SUM(res.passed), 0) AS passed "
+            "FROM runs r LEFT JOIN results res ON res.run_id = r.id GROUP BY r.id ORDER BY r.id DESC"
+        ).fetchall()
+
+    def run(self, run_id: int) -> Optional[sqlite3.Row]:
+        """Return a single run row."""
+        return self.conn.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+
+    def results(self, run_id: int) -> List[sqlite3.Row]:
+        """Return every result row of a run."""
+        return self.conn.execute(
+            "SELECT * FROM results WHERE run_id = ? ORDER BY pattern, id", (run_id,)
+        ).fetchall()
+
+    def pattern_stats(self, run_id: int) -> Dict[str, dict]:
+        """Aggregate a run's results per pattern: pass rate, p95 latency, chunks and tokens."""
+        grouped: Dict[str, List[sqlite3.Row]] = {}
+        for row in self.results(run_id):
+            grouped.setdefault(row["pattern"], []).append(row)
+
+        stats: Dict[str, dict] = {}
+        for pattern, rows in grouped.items():
+            latencies = [r["latency_ms"] for r in rows if r["latency_ms"] is not None]
+            stats[pattern] = {
+                "samples": len(rows),
+                "pass_rate": sum(r["passed"] for r in rows) / len(rows),
+                "p95_latency_ms": percentile(latencies, 95),
+                "chunks_used": max((r["chunks_used"] or 0) for r in rows),
+                "chunk_char_budget": max((r["chunk_char_budget"] or 0) for r in rows) or None,
+                "tokens": sum((r["prompt_tokens"] or 0) + (r["completion_tokens"] or 0) for r in rows),
+            }
+        return stats
+
+    def compare(
+        self,
+        base_id: int,
+        candidate_id: int,
+        latency_threshold: float = 0.2,
+        min_latency_ms: float = 500.0,
+    ) -> dict:
+        """Diff two runs and flag per-pattern accuracy and p95-latency regressions."""
+        base = self.pattern_stats(base_id)
+        candidate = self.pattern_stats(candidate_id)
+
+        patterns: List[dict] = []
+        for pattern in sorted(set(base) | set(candidate)):
+            before, after = base.get(pattern), candidate.get(pattern)
+            flags: List[str] = []
+            if before and after:
+                if after["pass_rate"] < before["pass_rate"]:
+                    flags.append("accuracy")
+                b95, a95 = before["p95_latency_ms"], after["p95_latency_ms"]
+                if b95 is not None and a95 is not None:
+                    if a95 - b95 > min_latency_ms and a95 > b95 * (1 + latency_threshold):
+                        flags.append("latency")
+            elif before:
+                flags.append("missing")
+            patterns.append({"pattern": pattern, "base": before, "candidate": after, "regressions": flags})
+
+        def overall(run_id: int) -> dict:
+            rows = self.results(run_id)
+            latencies = [r["latency_ms"] for r in rows if r["latency_ms"] is not None]
+            return {
+                "run_id": run_id,
+                "accuracy": sum(r["passed"] for r in rows) / len(rows) if rows else None,
+                "p95_latency_ms": percentile(latencies, 95),
+                "tokens": sum((r["prompt_tokens"] or 0) + (r["completion_tokens"] or 0) for r in rows),
+            }
+
+        return {
+            "base": overall(base_id),
+            "candidate": overall(candidate_id),
+            "patterns": patterns,
+            "regressions": [p["pattern"] for p in patterns if p["regressions"]],
+        }
+
+    def close(self) -> None:
+        """Close the underlying connection."""
+        self.conn.close()
+
+
+def normalize_status(entry: dict) -> bool:
+    """Read a legacy results.json entry's pass flag regardless of key or label spelling."""
+    status = entry.get("Status", entry.get("status", ""))
+    return str(status).strip().lower() == "pass"
+
+
+def format_ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:,.0f}"
+
+
+def print_report(report: dict) -> None:
+    base, cand = report["base"], report["candidate"]
+    print(f"Run {base['run_id']} -> {cand['run_id']}")
+    for label, data in (("base", base), ("candidate", cand)):
+        accuracy = "-" if data["accuracy"] is None else f"{data['accuracy']:.1%}"
+        print(f"  {label:10s} accuracy {accuracy:>7s}  p95 {format_ms(data['p95_latency_ms']):>8s} ms  tokens {data['tokens']:,}")
+    print()
+    print(f"{'pattern':42s} {'pass':>11s} {'p95 ms':>19s}  flags")
+    for entry in report["patterns"]:
+        before, after = entry["base"] or {}, entry["candidate"] or {}
+        passes = f"{before.get('pass_rate', 0):.0%} -> {after.get('pass_rate', 0):.0%}" if before and after else "-"
+        latency = f"{format_ms(before.get('p95_latency_ms'))} -> {format_ms(after.get('p95_latency_ms'))}"
+        flags = ", ".join(entry["regressions"])
+        if flags or before.get("pass_rate") != after.get("pass_rate"):
+            print(f"{entry['pattern']:42s} {passes:>11s} {latency:>19s}  {flags}")
+    print(f"\n{len(report['regressions'])} pattern(s) regressed.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect and compare stored benchmark runs.")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB, help="Path to the SQLite file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("list", help="List stored runs")
+
+    show = sub.add_parser("show", help="Show per-pattern results of a run")
+    show.add_argument("run_id", type=int)
+
+    report = sub.add_parser("report", help="Diff two runs and flag regressions")
+    report.add_argument("base", type=int)
+    report.add_argument("candidate", type=int)
+    report.add_argument("--latency-threshold", type=float, default=0.2)
+    report.add_argument("--min-latency-ms", type=float, default=500.0)
+    report.add_argument("--json", action="store_true")
+
+    legacy = sub.add_parser("import", help="Import a legacy results.json as a run")
+    legacy.add_argument("path", type=Path)
+    legacy.add_argument("--model", default="unknown")
+    legacy.add_argument("--notes")
+
+    args = parser.parse_args()
+    store = BenchmarkStore(args.db)
+    try:
+        if args.command == "list":
+            for run in store.runs():
+                print(
+                    f"#{run['id']:<4d} {run['started_at']}  {run['model']:32s} chunk={run['chunk_size']} "
+                    f"prompt={run['prompt_version']}  {run['passed']}/{run['total']} passed  {run['notes'] or ''}"
+                )
+        elif args.command == "show":
+            for pattern, stats in store.pattern_stats(args.run_id).items():
+                print(
+                    f"{pattern:42s} pass {stats['pass_rate']:.0%}  p95 {format_ms(stats['p95_latency_ms']):>8s} ms  "
+                    f"chunks {stats['chunks_used']} of {stats['chunk_char_budget'] or '-'} chars  tokens {stats['tokens']}"
+                )
+        elif args.command == "report":
+            result = store.compare(args.base, args.candidate, args.latency_threshold, args.min_latency_ms)
+            if args.json:
+                print(json.dumps(result, indent=2))
+            else:
+                print_report(result)
+            if result["regressions"]:
+                raise SystemExit(1)
+        elif args.command == "import":
+            entries = json.loads(args.path.read_text(encoding="utf-8"))
+            run_id = store.start_run(args.model, notes=args.notes or f"imported from {args.path.name}")
+            for entry in entries:
+                store.add_result(run_id, entry["pattern"], normalize_status(entry), entry.get("llm_answer", ""))
+            print(f"Imported {len(entries)} results as run #{run_id}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""
+llm_standin_server.py
+
+Local stand-in for the LM Studio server so the analyzer pipeline can be
+benchmarked without a GPU. Implements the endpoints OllamaClient uses
+(/v1/models, /api/v0/models/{id}, /v1/chat/completions incl. streaming and
+usage) with a configurable latency model and error injection.
+
+Modes:
+    synthetic  Answer every prompt with a canned response (default).
+    record     Proxy to a real server and store each response keyed by prompt hash.
+    replay     Serve stored responses; fall back to synthetic on a miss unless --strict.
+
+Usage:
+    python scripts/llm_standin_server.py
+    python scripts/llm_standin_server.py --mode record --upstream http://gpu-box:1234
+    python scripts/llm_standin_server.py --mode replay --ttft 0.2 --tokens-per-sec 60 --slots 2
+
+Point the analyzer at it with OLLAMA_BASE_URL=http://127.0.0.1:1235.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, List
+
+import requests
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CHARS_PER_TOKEN = 3.5
+DEFAULT_ANSWER = (
+    "The code routes object creation through a single shared instance.\n"
+    "Pattern Identified: Singleton\n"
+    "Confidence: 85"
+)
+
+
+@dataclass
+class StandInConfig:
+    """Runtime settings for the stand-in server."""
+
+    mode: str = "synthetic"
+    models: List[str] = field(default_factory=lambda: ["qwen3-coder-30b-a3b-instruct"])
+    context_length: int = 32768
+    answer: str = DEFAULT_ANSWER
+    ttft: float = 0.5  # seconds before the first token, excluding prefill
+    prompt_tokens_per_sec: float = 2000.0  # prefill speed
+    tokens_per_sec: float = 40.0  # decode speed
+    slots: int = 1  # concurrent generations; extra requests queue
+    error_rate: float = 0.0
+    error_status: int = 500
+    timeout_rate: float = 0.0  # share of requests that hang for --hang-seconds
+    hang_seconds: float = 600.0
+    upstream: str = "http://127.0.0.1:1234"
+    recordings: Path = Path("llm_recordings")
+    strict: bool = False
+    replay_recorded_latency: bool = False
+
+
+def prompt_hash(model: str, messages: List[dict]) -> str:
+    """Return the key under which a prompt's response is recorded."""
+    payload = json.dumps({"model": model, "messages": messages}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the token count of a string."""
+    return max(1, int(len(text) / CHARS_PER_TOKEN))
+
+
+def create_app(config: StandInConfig) -> FastAPI:
+    """Build the stand-in FastAPI application for the given configuration."""
+    app = FastAPI(title="LLM Stand-in Server")
+    slots = asyncio.Semaphore(config.slots)
+    stats = {"requests": 0, "errors": 0, "recorded": 0, "replayed": 0, "replay_misses": 0}
+    if config.mode == "record":
+        config.recordings.mkdir(parents=True, exist_ok=True)
+
+    def load_recording(key: str) -> dict | None:
+        path = config.recordings / f"{key}.json"
+        if not path.exists():
+            return None
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def record_upstream(payload: dict, key: str) -> dict:
+        upstream_payload = {**payload, "stream": False}
+        upstream_payload.pop("stream_options", None)
+        started = time.perf_counter()
+        try:
+            response = requests.post(f"{config.upstream}/v1/chat/completions", json=upstream_payload, timeout=3600)
+        except requests.exceptions.RequestException as exc:
+            raise HTTPException(status_code=502, detail=f"Upstream unreachable: {exc}") from exc
+        if not response.ok:
+            raise HTTPException(status_code=response.status_code, detail=response.text)
+        data = response.json()
+        recording = {
+            "model": payload.get("model"),
+            "content": data["choices"][0]["message"]["content"],
+            "usage": data.get("usage"),
+            "elapsed": time.perf_counter() - started,
+        }
+        (config.recordings / f"{key}.json").write_text(json.dumps(recording, indent=2, ensure_ascii=False))
+        stats["recorded"] += 1
+        return recording
+
+    async def resolve(payload: dict) -> tuple[str, dict, float | None]:
+        """Return the answer text, usage, and recorded latency (if replaying one)."""
+        messages = payload.get("messages", [])
+        model = payload.get("model", "")
+        key = prompt_hash(model, messages)
+        prompt_text = "\n".join(str(m.get("content", "")) for m in messages)
+
+        if config.mode == "record":
+            recording = await asyncio.to_thread(record_upstream, payload, key)
+            # The upstream call already took its time; replaying it here would double the latency.
+            return recording["content"], recording.get("usage") or {}, None
+
+        if config.mode == "replay":
+            recording = load_recording(key)
+            if recording:
+                stats["replayed"] += 1
+                elapsed = recording.get("elapsed") if config.replay_recorded_latency else None
+                return recording["content"], recording.get("usage") or {}, elapsed
+            stats["replay_misses"] += 1
+            if config.strict:
+                raise HTTPException(status_code=404, detail=f"No recording for prompt {key[:12]}")
+
+        content = config.answer
+        max_tokens = payload.get("max_tokens")
+        if max_tokens:
+            content = content[: int(max_tokens * CHARS_PER_TOKEN)]
+        usage = {"prompt_tokens": estimate_tokens(prompt_text), "completion_tokens": estimate_tokens(content)}
+        return content, usage, None
+
+    def normalize_usage(usage: dict, prompt_text: str, content: str) -> dict:
+        prompt_tokens = usage.get("prompt_tokens") or estimate_tokens(prompt_text)
+        completion_tokens = usage.get("completion_tokens") or estimate_tokens(content)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    def inject_error() -> None:
+        if config.error_rate and random.random() < config.error_rate:
+            stats["errors"] += 1
+            raise HTTPException(status_code=config.error_status, detail="Injected error from stand-in server.")
+
+    @app.get("/v1/models")
+    def list_models():
+        """List the configured models in OpenAI format."""
+        return {
+            "object": "list",
+            "data": [
+                {"id": m, "object": "model", "owned_by": "standin", "context_length": config.context_length}
+                for m in config.models
+            ],
+        }
+
+    @app.get("/api/v0/models/{model_id:path}")
+    def model_info(model_id: str):
+        """Report model details the way LM Studio's native REST API does."""
+        if model_id not in config.models:
+            raise HTTPException(status_code=404, detail="Model not found.")
+        return {
+            "id": model_id,
+            "state": "loaded",
+            "max_context_length": config.context_length,
+            "loaded_context_length": config.context_length,
+        }
+
+    @app.get("/standin/stats")
+    def get_stats():
+        """Return request, error, and record/replay counters."""
+        return stats
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        """Serve a chat completion following the configured mode and latency model."""
+        payload = await request.json()
+        stats["requests"] += 1
+        inject_error()
+        if config.timeout_rate and random.random() < config.timeout_rate:
+            await asyncio.sleep(config.hang_seconds)
+
+        model = payload.get("model", config.models[0])
+        prompt_text = "\n".join(str(m.get("content", "")) for m in payload.get("messages", []))
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        await slots.acquire()
+        try:
+            content, usage, recorded_elapsed = await resolve(payload)
+        except BaseException:
+            slots.release()
+            raise
+        usage = normalize_usage(usage, prompt_text, content)
+
+        if recorded_elapsed is not None:
+            first_token_delay = recorded_elapsed * 0.1
+            per_token_delay = recorded_elapsed * 0.9 / usage["completion_tokens"]
+        elif config.mode == "record":
+            first_token_delay = per_token_delay = 0.0
+        else:
+            first_token_delay = config.ttft + usage["prompt_tokens"] / config.prompt_tokens_per_sec
+            per_token_delay = 1 / config.tokens_per_sec
+
+        if not payload.get("stream"):
+            try:
+                await asyncio.sleep(first_token_delay + per_token_delay * usage["completion_tokens"])
+            finally:
+                slots.release()
+            return JSONResponse(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [
+                        {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                    ],
+                    "usage": usage,
+                }
+            )
+
+        include_usage = bool((payload.get("stream_options") or {}).get("include_usage"))
+
+        async def event_stream() -> AsyncIterator[str]:
+            def chunk(delta: dict, finish_reason: str | None = None) -> str:
+                body = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                return f"data: {json.dumps(body)}\n\n"
+
+            try:
+                await asyncio.sleep(first_token_delay)
+                yield chunk({"role": "assistant", "content": ""})
+                pieces = split_tokens(content, usage["completion_tokens"])
+                for piece in pieces:
+                    await asyncio.sleep(per_token_delay * usage["completion_tokens"] / len(pieces))
+                    yield chunk({"content": piece})
+                yield chunk({}, finish_reason="stop")
+                if include_usage:
+                    body = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                            "model": model, "choices": [], "usage": usage}
+                    yield f"data: {json.dumps(body)}\n\n"
+                yield "data: [DONE]\n\n"
+            finally:
+                slots.release()
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    return app
+
+
+def split_tokens(content: str, token_count: int) -> List[str]:
+    """Split text into roughly token-sized pieces for streaming."""
+    if not content:
+        return [""]
+    size = max(1, len(content) // max(token_count, 1))
+    return [content[i : i + size] for i in range(0, len(content), size)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a local LM Studio stand-in for offline benchmarking.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1235)
+    parser.add_argument("--mode", choices=["synthetic", "record", "replay"], default="synthetic")
+    parser.add_argument("--models", nargs="+", default=["qwen3-coder-30b-a3b-instruct"], help="Model ids to advertise")
+    parser.add_argument("--context-length", type=int, default=32768)
+    parser.add_argument("--answer-file", type=Path, help="File whose text is returned for synthetic answers")
+    parser.add_argument("--ttft", type=float, default=0.5, help="Seconds before the first token, excluding prefill")
+    parser.add_argument("--prompt-tokens-per-sec", type=float, default=2000.0, help="Prefill speed")
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0, help="Decode speed")
+    parser.add_argument("--slots", type=int, default=1, help="Concurrent generations; further requests queue")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Share of requests that hang for --hang-seconds")
+    parser.add_argument("--hang-seconds", type=float, default=600.0)
+    parser.add_argument("--upstream", default="http://127.0.0.1:1234", help="Real server used in record mode")
+    parser.add_argument("--recordings", type=Path, default=Path("llm_recordings"), help="Folder of recorded responses")
+    parser.add_argument("--strict", action="store_true", help="In replay mode, return 404 for unrecorded prompts")
+    parser.add_argument("--replay-recorded-latency", action="store_true", help="Replay with the latency observed while recording")
+    args = parser.parse_args()
+
+    config = StandInConfig(
+        mode=args.mode,
+        models=args.models,
+        context_length=args.context_length,
+        answer=args.answer_file.read_text(encoding="utf-8") if args.answer_file else DEFAULT_ANSWER,
+        ttft=args.ttft,
+        prompt_tokens_per_sec=args.prompt_tokens_per_sec,
+        tokens_per_sec=args.tokens_per_sec,
+        slots=args.slots,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        timeout_rate=args.timeout_rate,
+        hang_seconds=args.hang_seconds,
+        upstream=args.upstream.rstrip("/"),
+        recordings=args.recordings,
+        strict=args.strict,
+        replay_recorded_latency=args.replay_recorded_latency,
+    )
+    print(f"LLM stand-in ({config.mode}) at http://{args.host}:{args.port}")
+    uvicorn.run(create_app(config), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+load_test.py
+
+Replays a mix of /analyze, /analyze-folder, /followup and /generate traffic
+against a running API at increasing concurrency levels and writes a JSON
+report of throughput, error rate and latency percentiles per endpoint and level.
+
+Each level runs for --duration seconds. Without --rate, every one of the
+level's users sends its next request as soon as the previous one returns
+(closed loop). With --rate, requests arrive as a Poisson process at that many
+per second and the level caps how many are in flight (open loop); latency is
+then measured from the scheduled arrival, so queueing in the client counts.
+
+Usage:
+    python scripts/load_test.py run --concurrency 1,2,4,8 --duration 60
+    python scripts/load_test.py run --rate 0.5 --mix analyze=1,followup=3 --output load_report.json
+    python scripts/load_test.py compare base.json candidate.json
+
+Optional flags (run):
+    --url           API base URL                                  (default: http://localhost:8000)
+    --model         Model sent with every request                 (default: qwen3-coder-30b-a3b-instruct)
+    --mix           endpoint=weight pairs                         (default: analyze=2,analyze-folder=1,followup=2,generate=1)
+    --corpus        Packed corpus to draw projects from           (default: zips in datasets_zipped/)
+    --projects      Projects sampled for upload payloads          (default: 20)
+    --timeout       Per-request timeout in seconds                (default: 360)
+"""
+
+import argparse
+import io
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from benchmark_store import percentile
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+ZIPPED_DIR = ROOT_DIR / "datasets_zipped"
+MODEL = "qwen3-coder-30b-a3b-instruct"
+DEFAULT_MIX = "analyze=2,analyze-folder=1,followup=2,generate=1"
+
+FOLLOWUP_QUESTIONS = [
+    "Which class plays the central role in this pattern?",
+    "How could this implementation be made thread-safe?",
+    "What would change if a new variant had to be added?",
+]
+GENERATE_REQUESTS = [
+    ("Singleton", "A configuration registry loaded once at startup."),
+    ("Observer", "Stock price updates pushed to several dashboards."),
+    ("Builder", "Constructing HTTP requests with optional headers and body."),
+    ("Strategy", "Interchangeable shipping cost calculators."),
+]
+SAMPLE_ANALYSIS = (
+    "Pattern Identified: Singleton\n"
+    "Evidence: IvoryTower has a private constructor and a static getInstance() returning the only instance.\n"
+    "Files: src/main/java/com/iluwatar/singleton/IvoryTower.java"
+)
+
+
+@dataclass
+class Sample:
+    endpoint: str
+    status: Optional[int]
+    latency_ms: float
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status is not None and 200 <= self.status < 300
+
+
+class Workload:
+    """Builds request payloads for each endpoint from a sample of benchmark projects."""
+
+    def __init__(self, base_url: str, model: str, projects: List[Tuple[str, Dict[str, bytes]]], timeout: float) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.projects = projects
+        self.timeout = timeout
+        self._zips = {name: self._zip(files) for name, files in projects}
+
+    @staticmethod
+    def _zip(files: Dict[str, bytes]) -> bytes:
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for path, data in files.items():
+                archive.writestr(path, data)
+        return buffer.getvalue()
+
+    def send(self, endpoint: str, rng: random.Random, client_id: str) -> requests.Response:
+        """Send one request to the endpoint with a randomly chosen payload."""
+        headers = {"X-Client-ID": client_id}
+        form = {"model": self.model}
+        if endpoint == "analyze":
+            name, _ = rng.choice(self.projects)
+            files = {"file": (f"{name}.zip", self._zips[name], "application/zip")}
+            return requests.post(f"{self.base_url}/analyze", files=files, data=form, headers=headers, timeout=self.timeout)
+        if endpoint == "analyze-folder":
+            _, project = rng.choice(self.projects)
+            files = [("files", (path, data, "text/x-java")) for path, data in project.items()]
+            return requests.post(f"{self.base_url}/analyze-folder", files=files, data=form, headers=headers, timeout=self.timeout)
+        if endpoint == "followup":
+            body = {"analysis": SAMPLE_ANALYSIS, "question": rng.choice(FOLLOWUP_QUESTIONS), "model": self.model}
+            return requests.post(f"{self.base_url}/followup", json=body, headers=headers, timeout=self.timeout)
+        if endpoint == "generate":
+            pattern, description = rng.choice(GENERATE_REQUESTS)
+            body = {"pattern": pattern, "description": description, "model": self.model}
+            return requests.post(f"{self.base_url}/generate", json=body, headers=headers, timeout=self.timeout)
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+
+    def timed(self, endpoint: str, rng: random.Random, client_id: str, scheduled: float) -> Sample:
+        """Send a request and measure its latency from the scheduled start."""
+        try:
+            response = self.send(endpoint, rng, client_id)
+            status, error = response.status_code, None if response.ok else response.text[:200]
+        except requests.exceptions.RequestException as exc:
+            status, error = None, type(exc).__name__
+        return Sample(endpoint, status, (time.perf_counter() - scheduled) * 1000, error)
+
+
+def load_projects(corpus: Optional[Path], count: int, rng: random.Random) -> List[Tuple[str, Dict[str, bytes]]]:
+    """Sample projects as path -> source bytes, from a packed corpus or the dataset zips."""
+    projects: List[Tuple[str, Dict[str, bytes]]] = []
+    if corpus:
+        from packed_corpus import PackedCorpus
+
+        with PackedCorpus(corpus) as packed:
+            names = packed.names()
+            for name in rng.sample(names, min(count, len(names))):
+                projects.append((name, {path: bytes(data) for path, data in packed.file_views(name)}))
+        return projects
+
+    zips = sorted(ZIPPED_DIR.glob("*.zip"))
+    for zip_path in rng.sample(zips, min(count, len(zips))):
+        with zipfile.ZipFile(zip_path) as archive:
+            files = {i.filename: archive.read(i) for i in archive.infolist() if i.filename.endswith(".java")}
+        projects.append((zip_path.stem, files))
+    return projects
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for part in text.split(","):
+        endpoint, _, weight = part.partition("=")
+        mix[endpoint.strip()] = float(weight or 1)
+    return mix
+
+
+def run_level(
+    workload: Workload, mix: Dict[str, float], concurrency: int, duration: float, rate: Optional[float], seed: int
+) -> dict:
+    """Drive one concurrency level for the given duration and summarize its samples."""
+    samples: List[Sample] = []
+    lock = threading.Lock()
+    endpoints, weights = list(mix), list(mix.values())
+    started = time.perf_counter()
+    deadline = started + duration
+
+    def record(sample: Sample) -> None:
+        with lock:
+            samples.append(sample)
+
+    if rate:
+        rng = random.Random(seed)
+        slots = threading.Semaphore(concurrency)
+
+        def fire(endpoint: str, scheduled: float, n: int) -> None:
+            with slots:
+                record(workload.timed(endpoint, random.Random(seed + n), f"loadtest-{n % concurrency}", scheduled))
+
+        with ThreadPoolExecutor(max_workers=concurrency * 4) as pool:
+            next_arrival, n = started, 0
+            while next_arrival < deadline:
+                time.sleep(max(0.0, next_arrival - time.perf_counter()))
+                pool.submit(fire, rng.choices(endpoints, weights)[0], next_arrival, n)
+                n += 1
+                next_arrival += rng.expovariate(rate)
+    else:
+        def user(index: int) -> None:
+            rng = random.Random(seed + index)
+            while time.perf_counter() < deadline:
+                record(workload.timed(rng.choices(endpoints, weights)[0], rng, f"loadtest-{index}", time.perf_counter()))
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for index in range(concurrency):
+                pool.submit(user, index)
+
+    elapsed = time.perf_counter() - started
+    return summarize(samples, concurrency, rate, elapsed)
+
+
+def _stats(samples: List[Sample], elapsed: float) -> dict:
+    latencies = [s.latency_ms for s in samples if s.ok]
+    statuses: Dict[str, int] = {}
+    for s in samples:
+        key = str(s.status) if s.status is not None else (s.error or "error")
+        statuses[key] = statuses.get(key, 0) + 1
+    errors = sum(1 for s in samples if not s.ok)
+
+    def pct(p: float) -> Optional[float]:
+        value = percentile(latencies, p)
+        return None if value is None else round(value, 1)
+
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(sum(1 for s in samples if s.ok) / elapsed, 3) if elapsed else 0.0,
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "max_ms": round(max(latencies), 1) if latencies else None,
+        "statuses": statuses,
+    }
+
+
+def summarize(samples: List[Sample], concurrency: int, rate: Optional[float], elapsed: float) -> dict:
+    by_endpoint: Dict[str, List[Sample]] = {}
+    for sample in samples:
+        by_endpoint.setdefault(sample.endpoint, []).append(sample)
+    return {
+        "concurrency": concurrency,
+        "arrival_rate": rate,
+        "elapsed_s": round(elapsed, 2),
+        "overall": _stats(samples, elapsed),
+        "endpoints": {endpoint: _stats(group, elapsed) for endpoint, group in sorted(by_endpoint.items())},
+    }
+
+
+def build_id() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(base: dict, candidate: dict, latency_threshold: float, throughput_threshold: float) -> List[str]:
+    """Return regressions of the candidate report against the base, per level and endpoint."""
+    regressions: List[str] = []
+    base_levels = {(lvl["concurrency"], lvl["arrival_rate"]): lvl for lvl in base["levels"]}
+    for level in candidate["levels"]:
+        before = base_levels.get((level["concurrency"], level["arrival_rate"]))
+        if before is None:
+            continue
+        for endpoint, after in {"overall": level["overall"], **level["endpoints"]}.items():
+            prior = before["overall"] if endpoint == "overall" else before["endpoints"].get(endpoint)
+            if not prior:
+                continue
+            label = f"c={level['concurrency']} {endpoint}"
+            if prior["p95_ms"] and after["p95_ms"] and after["p95_ms"] > prior["p95_ms"] * (1 + latency_threshold):
+                regressions.append(f"{label}: p95 {prior['p95_ms']:.0f} -> {after['p95_ms']:.0f} ms")
+            if after["error_rate"] > prior["error_rate"] + 0.01:
+                regressions.append(f"{label}: error rate {prior['error_rate']:.1%} -> {after['error_rate']:.1%}")
+            if after["throughput_rps"] < prior["throughput_rps"] * (1 - throughput_threshold):
+                regressions.append(f"{label}: throughput {prior['throughput_rps']:.2f} -> {after['throughput_rps']:.2f} rps")
+    return regressions
+
+
+def print_level(level: dict) -> None:
+    rate = f" rate={level['arrival_rate']}/s" if level["arrival_rate"] else ""
+    print(f"\nconcurrency={level['concurrency']}{rate}  ({level['elapsed_s']}s)")
+    print(f"  {'endpoint':16s} {'reqs':>6s} {'err%':>6s} {'rps':>7s} {'p50':>8s} {'p95':>8s} {'p99':>8s}")
+    for endpoint, stats in {**level["endpoints"], "overall": level["overall"]}.items():
+        cells = [f"{stats[k]:>8.0f}" if stats[k] is not None else f"{'-':>8s}" for k in ("p50_ms", "p95_ms", "p99_ms")]
+        print(f"  {endpoint:16s} {stats['requests']:>6d} {stats['error_rate']:>6.1%} {stats['throughput_rps']:>7.2f} {' '.join(cells)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test a running Design Patterns Analyzer API.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Run the load test and write a JSON report")
+    run.add_argument("--url", default="http://localhost:8000")
+    run.add_argument("--model", default=MODEL)
+    run.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight pairs")
+    run.add_argument("--concurrency", default="1,2,4,8", help="Comma-separated concurrency levels")
+    run.add_argument("--duration", type=float, default=60.0, help="Seconds per level")
+    run.add_argument("--rate", type=float, help="Poisson arrivals per second (open loop)")
+    run.add_argument("--corpus", type=Path, help="Packed corpus to draw projects from")
+    run.add_argument("--projects", type=int, default=20, help="Projects sampled for upload payloads")
+    run.add_argument("--timeout", type=float, default=360.0)
+    run.add_argument("--seed", type=int, default=1)
+    run.add_argument("--output", type=Path, default=Path("load_report.json"))
+
+    cmp = sub.add_parser("compare", help="Flag regressions between two reports")
+    cmp.add_argument("base", type=Path)
+    cmp.add_argument("candidate", type=Path)
+    cmp.add_argument("--latency-threshold", type=float, default=0.2)
+    cmp.add_argument("--throughput-threshold", type=float, default=0.1)
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        base = json.loads(args.base.read_text(encoding="utf-8"))
+        candidate = json.loads(args.candidate.read_text(encoding="utf-8"))
+        regressions = compare(base, candidate, args.latency_threshold, args.throughput_threshold)
+        for line in regressions:
+            print(line)
+        print(f"{len(regressions)} regression(s): {base.get('build')} -> {candidate.get('build')}")
+        if regressions:
+            raise SystemExit(1)
+        return
+
+    mix = parse_mix(args.mix)
+    projects = load_projects(args.corpus, args.projects, random.Random(args.seed))
+    if not projects and {"analyze", "analyze-folder"} & set(mix):
+        print("[ERROR] No projects found for upload payloads.")
+        raise SystemExit(1)
+    workload = Workload(args.url, args.model, projects, args.timeout)
+    try:
+        health = requests.get(f"{args.url.rstrip('/')}/health", timeout=5).json()
+    except (requests.exceptions.RequestException, ValueError):
+        health = {}
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "build": build_id(),
+        "host": platform.node(),
+        "url": args.url,
+        "model": args.model,
+        "mix": mix,
+        "duration_s": args.duration,
+        "server": health,
+        "levels": [],
+    }
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        level = run_level(workload, mix, concurrency, args.duration, args.rate, args.seed)
+        report["levels"].append(level)
+        print_level(level)
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nReport -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+packed_corpus.py
+
+Packs every Java project of the benchmark datasets into a single file that can
+be read through mmap without extracting anything, and reads it back.
+
+Layout:
+    header   32 bytes   magic, format version, index offset, index length
+    blobs               normalized UTF-8 sources, back to back
+    index               JSON: projects -> [path, offset, length] per file
+
+Sources are normalized the way the analyzer ingests an upload (skipped
+directories dropped, runs of blank lines compressed), so a packed project
+equals what FileService.read_zip_sources returns for its zip.
+
+Usage:
+    python scripts/packed_corpus.py build
+    python scripts/packed_corpus.py info
+    python scripts/packed_corpus.py show singleton
+
+Optional flags:
+    --corpus    Path to the packed file                               (default: corpus.jpack)
+    --source    Folder of project directories (with src/) or .zip files (default: datasets/, else datasets_zipped/)
+    --workers   Parallel project loaders                              (default: CPU count)
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from services.file_service import FileService  # noqa: E402
+
+DEFAULT_CORPUS = ROOT_DIR / "corpus.jpack"
+MAGIC = b"JAVAPACK"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIQQ4x")  # magic, version, index offset, index length; padded to 32 bytes
+
+
+def load_project(source: Path) -> Tuple[str, List[Tuple[str, bytes]]]:
+    """Read and normalize one project's Java files from a directory's src/ or from a zip."""
+    if source.suffix == ".zip":
+        sources = FileService().read_zip_sources(str(source))
+        return source.stem, [(relative, bytes(sources.view(relative))) for relative in sorted(sources)]
+
+    files: Dict[str, str] = {}
+    for path in (source / "src").rglob("*.java"):
+        relative = FileService.java_source_path(path.relative_to(source).as_posix())
+        if relative is not None:
+            files[relative] = path.read_text(encoding="utf-8", errors="ignore")
+    normalized = [
+        (relative, FileService._compress_blank_lines(content).encode("utf-8"))
+        for relative, content in sorted(files.items())
+    ]
+    return source.stem, normalized
+
+
+def build_corpus(sources: List[Path], output: Path, workers: int | None = None) -> dict:
+    """Load projects in parallel and stream them into one packed file; return the index."""
+    projects: List[dict] = []
+    tmp_path = output.with_suffix(output.suffix + ".tmp")
+    with open(tmp_path, "wb") as out, ProcessPoolExecutor(max_workers=workers) as pool:
+        out.write(bytes(HEADER.size))
+        for name, files in pool.map(load_project, sources, chunksize=4):
+            if not files:
+                continue
+            entries = []
+            for relative, data in files:
+                entries.append([relative, out.tell(), len(data)])
+                out.write(data)
+            projects.append({"name": name, "files": entries})
+
+        index = {"version": FORMAT_VERSION, "projects": projects}
+        index_bytes = json.dumps(index, separators=(",", ":")).encode("utf-8")
+        index_offset = out.tell()
+        out.write(index_bytes)
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, FORMAT_VERSION, index_offset, len(index_bytes)))
+    os.replace(tmp_path, output)
+    return index
+
+
+class PackedCorpus:
+    """Read-only, memory-mapped view of a packed corpus."""
+
+    def __init__(self, path: Path = DEFAULT_CORPUS) -> None:
+        """Map the file and load its index."""
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_offset, index_length = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a packed corpus (version {FORMAT_VERSION})")
+        index = json.loads(self._map[index_offset:index_offset + index_length])
+        self._projects: Dict[str, List[list]] = {p["name"]: p["files"] for p in index["projects"]}
+        self._view = memoryview(self._map)
+
+    def __enter__(self) -> "PackedCorpus":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._projects)
+
+    def names(self) -> List[str]:
+        """Return project names in packing order."""
+        return list(self._projects)
+
+    def file_views(self, name: str) -> Iterator[Tuple[str, memoryview]]:
+        """Yield a project's file paths with zero-copy views of their UTF-8 bytes."""
+        for path, offset, length in self._projects[name]:
+            yield path, self._view[offset:offset + length]
+
+    def project(self, name: str) -> Dict[str, str]:
+        """Return a project as the analyzer's java_files mapping of path to source."""
+        return {path: str(data, "utf-8") for path, data in self.file_views(name)}
+
+    def __iter__(self) -> Iterator[Tuple[str, Dict[str, str]]]:
+        for name in self._projects:
+            yield name, self.project(name)
+
+    def close(self) -> None:
+        """Release the mapping and the file handle."""
+        if getattr(self, "_view", None) is not None:
+            self._view.release()
+            self._view = None
+        try:
+            self._map.close()
+        except BufferError:
+            pass  # callers still hold file views; the mapping is released with the last of them
+        self._file.close()
+
+
+def default_sources() -> List[Path]:
+    datasets = ROOT_DIR / "datasets"
+    if datasets.is_dir():
+        return sorted(p for p in datasets.iterdir() if p.is_dir())
+    return sorted((ROOT_DIR / "datasets_zipped").glob("*.zip"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build and inspect the packed benchmark corpus.")
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS, help="Path to the packed file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Pack all dataset projects into one file")
+    build.add_argument("--source", type=Path, help="Folder of project directories or .zip files")
+    build.add_argument("--workers", type=int, default=None, help="Parallel project loaders")
+
+    sub.add_parser("info", help="Summarize the corpus and time a full pass over it")
+
+    show = sub.add_parser("show", help="List the files of one project")
+    show.add_argument("name")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        if args.source:
+            entries = sorted(args.source.resolve().iterdir())
+            sources = [p for p in entries if p.is_dir() or p.suffix == ".zip"]
+        else:
+            sources = default_sources()
+        if not sources:
+            print("[ERROR] No projects found to pack.")
+            raise SystemExit(1)
+        started = time.perf_counter()
+        index = build_corpus(sources, args.corpus.resolve(), args.workers)
+        files = sum(len(p["files"]) for p in index["projects"])
+        print(f"Packed {len(index['projects'])} projects, {files} files -> {args.corpus} "
+              f"({args.corpus.stat().st_size / 1024:,.0f} KiB) in {time.perf_counter() - started:.2f}s")
+    elif args.command == "info":
+        with PackedCorpus(args.corpus) as corpus:
+            started = time.perf_counter()
+            files = chars = 0
+            for _, java_files in corpus:
+                files += len(java_files)
+                chars += sum(len(content) for content in java_files.values())
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            print(f"{len(corpus)} projects, {files} files, {chars:,} chars; full pass in {elapsed_ms:.1f} ms")
+    elif args.command == "show":
+        with PackedCorpus(args.corpus) as corpus:
+            for path, data in corpus.file_views(args.name):
+                print(f"{len(data):>8,d}  {path}")
+
+
+if __name__ == "__main__":
+    main()
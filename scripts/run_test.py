@@ -1,15 +1,23 @@
+import argparse
 import json
 import re
 import time
+from collections import Counter
 from pathlib import Path
 
 
 import requests
 
+from benchmark_store import DEFAULT_DB, BenchmarkStore
+
 API_URL = "http://localhost:8000/analyze"
+FOLDER_API_URL = "http://localhost:8000/analyze-folder"
+HEALTH_URL = "http://localhost:8000/health"
 ZIPPED_DIR = Path("datasets_zipped")
 OUTPUT_FILE = Path("results.json")
 MODEL = "qwen3-coder-30b-a3b-instruct"
+PASS_LABEL = "Pass"
+FAIL_LABEL = "Not Pass"
 
 
 PATTERN_ALIASES: dict[str, list[str]] = {
@@ -233,51 +241,129 @@ def format_raw_response(raw_analysis: str) -> str:
 
     return raw_analysis.strip()
 
+def fetch_server_config() -> dict:
+    """Read the prompt version and static settings from the API's /health endpoint, if it reports them."""
+    try:
+        response = requests.get(HEALTH_URL, timeout=5)
+        return response.json() if response.ok else {}
+    except (requests.exceptions.RequestException, ValueError):
+        return {}
+
+
+def post_zip(zip_path: Path, model: str) -> requests.Response:
+    """Upload one zipped project to /analyze."""
+    with open(zip_path, "rb") as f: #Try to open the path in the "read binary" mode
+        return requests.post(
+            API_URL,
+            files={"file": (zip_path.name, f, "application/zip")},
+            data={"model": model},
+            timeout=360,
+        )
+
+
+def post_packed(corpus, name: str, model: str) -> requests.Response:
+    """Upload one project's files straight from the packed corpus to /analyze-folder."""
+    files = [("files", (path, bytes(data), "text/x-java")) for path, data in corpus.file_views(name)]
+    return requests.post(FOLDER_API_URL, files=files, data={"model": model}, timeout=360)
+
+
 def main():
-    zip_files = sorted(ZIPPED_DIR.glob("*.zip"))
-    if not zip_files:
-        print("No zip files found in", ZIPPED_DIR)
+    parser = argparse.ArgumentParser(description="Run the pattern benchmark against a running API.")
+    parser.add_argument("--model", default=MODEL)
+    parser.add_argument("--repeat", type=int, default=1, help="Analyses per pattern, for per-pattern p95 latency")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB, help="SQLite run store")
+    parser.add_argument("--notes", help="Free-text note stored with the run")
+    parser.add_argument("--corpus", type=Path, help="Packed corpus (scripts/packed_corpus.py) to read instead of zips")
+    args = parser.parse_args()
+
+    corpus = None
+    if args.corpus:
+        from packed_corpus import PackedCorpus
+
+        corpus = PackedCorpus(args.corpus)
+        projects = [(name, lambda name=name: post_packed(corpus, name, args.model)) for name in corpus.names()]
+        api_url = FOLDER_API_URL
+    else:
+        zip_files = sorted(ZIPPED_DIR.glob("*.zip"))
+        projects = [(z.stem, lambda z=z: post_zip(z, args.model)) for z in zip_files]
+        api_url = API_URL
+    if not projects:
+        print("No projects found in", args.corpus or ZIPPED_DIR)
         return
-    
+
+    server_config = fetch_server_config()
+    store = BenchmarkStore(args.db)
+    # The chunk size is set per model by the server; the run records what its analyses reported.
+    run_id = store.start_run(
+        model=args.model,
+        prompt_version=server_config.get("prompt_version"),
+        config={"repeat": args.repeat, "api_url": api_url, **server_config},
+        notes=args.notes,
+    )
+    print(f"Benchmark run #{run_id} -> {args.db}")
+
     results = [] 
-    for idx, zip_path in enumerate(zip_files, start=1):
-        stem = zip_path.stem # Get the names of the file without the extension
-        print(f"[{idx}/{len(zip_files)}] {stem} ...", end=" ", flush=True)
+    chunk_budgets: Counter = Counter()
+    for idx, (stem, send) in enumerate(projects, start=1):
+        for attempt in range(args.repeat):
+            print(f"[{idx}/{len(projects)}] {stem} ...", end=" ", flush=True)
+            outcome = {"passed": False, "llm_answer": "", "error": None}
+            started = time.perf_counter()
+            data = {}
+
+            try:
+                response = send()
+
+                if not response.ok:
+                    print(f"HTTP {response.status_code}")
+                    outcome["error"] = f"ERROR: HTTP {response.status_code}"
+                else:
+                    data = response.json()
+                    formatted_repsonse = format_raw_response(data.get("raw_analysis", ""))
+                    outcome["passed"] = is_match(stem, formatted_repsonse)
+                    outcome["llm_answer"] = formatted_repsonse
+                    print(PASS_LABEL if outcome["passed"] else FAIL_LABEL)
 
-        try:
-            with open(zip_path, "rb") as f: #Try to open the path in the "read binary" mode
-                response = requests.post(
-                    API_URL, 
-                    files={"file": (zip_path.name, f, "application/zip")},
-                    data={"model": MODEL},
-                    timeout=360,
-                )
+            except requests.exceptions.Timeout:
+                print("TIMEOUT, TRY AGAIN LATER!")
+                outcome["error"] = "ERROR: Request timed out"
+            except Exception as e:
+                print("Error:", e)
+                outcome["error"] = f"Error: {e}"
 
-            if not response.ok:
-                print(f"HTTP {response.status_code}")
-                results.append({"pattern": stem, 
-                                "llm_answer": f"ERROR: HTTP {response.status_code}", 
-                                "status" : "Not Pass!"})
-                continue
-            raw_analysis = response.json().get("raw_analysis", "")
-            formatted_repsonse = format_raw_response(raw_analysis)
-            passed = is_match(stem, formatted_repsonse)
-            label = "Pass" if passed else "Not Pass"
-            print(label)
-            results.append({"pattern": stem, "llm_answer":formatted_repsonse, "Status": label})
+            latency_ms = (time.perf_counter() - started) * 1000
+            store.add_result(
+                run_id,
+                stem,
+                outcome["passed"],
+                llm_answer=outcome["llm_answer"],
+                error=outcome["error"],
+                latency_ms=latency_ms,
+                chunks_used=data.get("chunks_used"),
+                prompt_tokens=data.get("prompt_tokens"),
+                completion_tokens=data.get("completion_tokens"),
+                chunk_char_budget=data.get("chunk_char_budget"),
+            )
+            if data.get("chunk_char_budget"):
+                chunk_budgets[data["chunk_char_budget"]] += 1
+            if attempt == 0:
+                results.append({
+                    "pattern": stem,
+                    "llm_answer": outcome["error"] or outcome["llm_answer"],
+                    "Status": PASS_LABEL if outcome["passed"] else FAIL_LABEL,
+                    "latency_ms": round(latency_ms, 1),
+                })
+            time.sleep(1)
 
-                
-        except requests.exceptions.Timeout:
-            print("TIMEOUT, TRY AGAIN LATER!")
-            results.append({"pattern": stem, "llm_answer": "ERROR: Request timed out", "Status": "Not Pass"})
-        except Exception as e:
-            print("Error:", e)
-            results.append({"pattern": stem, "llm_answer": f"Error: {e}", "Status": "Not Passed"})
-        
-        time.sleep(1)
+    if chunk_budgets:
+        store.set_chunk_size(run_id, chunk_budgets.most_common(1)[0][0])
+    store.close()
+    if corpus is not None:
+        corpus.close()
     OUTPUT_FILE.write_text(json.dumps(results, indent=2, ensure_ascii=False))
-    passed = sum(1 for r in results if r["Status"] == "Pass")
+    passed = sum(1 for r in results if r["Status"] == PASS_LABEL)
     print(f"\nDone. {passed}/{len(results)} passed. Results -> {OUTPUT_FILE}")
+    print(f"Compare with an earlier run: python scripts/benchmark_store.py report <base> {run_id}")
 
 
 if __name__ == "__main__":
@@ -20,7 +20,11 @@ def main() -> None:
 
     results = json.loads(RESULTS_FILE.read_text(encoding="utf-8"))
 
-    passing = [entry for entry in results if entry.get("Status") == "Pass"]
+    # Older runs wrote both "status"/"Status" keys; only the "Pass" label means success.
+    passing = [
+        entry for entry in results
+        if str(entry.get("Status", entry.get("status", ""))).strip().lower() == "pass"
+    ]
 
     OUTPUT_FILE.write_text(json.dumps(passing, indent=2, ensure_ascii=False))
 
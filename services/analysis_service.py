@@ -1,15 +1,66 @@
+import contextvars
 import logging
-from typing import Dict, List
+import math
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
 
-from llm.client import OllamaClient
+from fastapi import HTTPException
+
+from config import settings
+from llm.client import (
+    LLMCancelledError,
+    LLMContextOverflowError,
+    LLMError,
+    LLMResult,
+    LLMTimeoutError,
+    LLMTransientError,
+    OllamaClient,
+)
+from llm.cancellation import CANCEL_EARLY_EXIT, CancelScope, cancel_scope
+from llm.chunk_budget import ChunkBudgetPlanner
 from llm.chunker import Chunker
+from llm.project_index import ProjectIndex, SimilarProject
+from llm.summary_cache import SummaryCache
+from llm.token_budget import TokenBudget
 from models.response_models import AnalysisResponse
 from services.file_service import FileService
 from services.prompt_service import PromptService
 from utils import validators
+from utils.source_set import SourceSet
+from utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
+_MIN_SPLIT_CHARS = 500
+_SUMMARY_HEADER_TOKENS = 20  # "### FILE: <path>" line preceding each summary in the answer
+
+
+@dataclass
+class ChunkOutcome:
+    """Results and file coverage of one chunk, including any retried sub-chunks."""
+
+    results: List[LLMResult] = field(default_factory=list)
+    covered: List[str] = field(default_factory=list)
+    retried: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    budget_skipped: bool = False
+    elapsed: float = 0.0
+
+    def absorb(self, other: "ChunkOutcome") -> None:
+        """Fold a sub-chunk's outcome into this one."""
+        self.results.extend(other.results)
+        self.covered.extend(other.covered)
+        self.retried.extend(other.retried)
+        self.skipped.extend(other.skipped)
+        self.errors.extend(other.errors)
+        self.budget_skipped = self.budget_skipped or other.budget_skipped
+        self.elapsed += other.elapsed
+
 
 class AnalysisService:
     """Coordinate validation, prompt construction, LLM calls, and response assembly."""
@@ -20,43 +71,496 @@ class AnalysisService:
         chunker: Chunker | None = None,
         prompt_service: PromptService | None = None,
         ollama_client: OllamaClient | None = None,
+        budget_planner: ChunkBudgetPlanner | None = None,
+        summary_cache: SummaryCache | None = None,
+        project_index: ProjectIndex | None = None,
     ) -> None:
         """Initialize service dependencies with defaults when not provided."""
         self.file_service = file_service or FileService()
         self.chunker = chunker or Chunker()
         self.prompt_service = prompt_service or PromptService()
         self.ollama_client = ollama_client or OllamaClient()
+        self.budget_planner = budget_planner or ChunkBudgetPlanner(self.ollama_client)
+        self.summary_cache = summary_cache or SummaryCache()
+        self.project_index = project_index or ProjectIndex()
 
-    def analyze(self, java_files: Dict[str, str], model: str) -> AnalysisResponse:
+    def analyze(
+        self,
+        java_files: Mapping[str, str],
+        model: str,
+        early_exit: bool = False,
+        token_budget: int | None = None,
+        hierarchical: bool = False,
+        reuse_similar: bool = False,
+    ) -> AnalysisResponse:
         """Run the end-to-end analysis flow and return a structured response."""
         validators.validate_files(java_files)
+        # One buffer for the whole project; chunks and retries are views over it.
+        java_files = SourceSet.from_files(java_files)
 
-        folder_tree = self.file_service.build_folder_tree(java_files)
-        chunks = self.chunker.chunk_files(java_files)
+        signature: List[int] | None = None
+        similar: SimilarProject | None = None
+        namespace = f"{model}|{self.prompt_service.PROMPT_VERSION}"
+        if reuse_similar:
+            with span("similarity.lookup") as attrs:
+                signature = self.project_index.signature(java_files)
+                if signature is not None:
+                    similar = self.project_index.lookup(signature, namespace, settings.SIMILARITY_SEED_THRESHOLD)
+                attrs["similarity"] = similar.similarity if similar else None
+            if similar and similar.similarity >= settings.SIMILARITY_REUSE_THRESHOLD:
+                logger.info("Reusing analysis of project %d (similarity=%.3f)", similar.project_id, similar.similarity)
+                return AnalysisResponse(
+                    model_used=model,
+                    file_count=len(java_files),
+                    files_analyzed=list(java_files.keys()),
+                    folder_structure=self.file_service.build_folder_tree(java_files),
+                    raw_analysis=similar.analysis,
+                    chunks_used=0,
+                    token_budget=token_budget,
+                    reused=True,
+                    similar_project_id=similar.project_id,
+                    similarity=similar.similarity,
+                )
+        prior_analysis = similar.analysis if similar else None
 
-        logger.info("Starting analysis: %d files, %d chunk(s)", len(java_files), len(chunks))
-        partial_results: List[str] = []
-        for idx, chunk in enumerate(chunks):
-            prompt = self.prompt_service.build_chunk_prompt(
-                chunk, idx, len(chunks)
-            )
-            logger.info("Processing chunk %d/%d (%d files, prompt_chars=%d)", idx + 1, len(chunks), len(chunk), len(prompt))
-            result = self.ollama_client.generate(prompt, model)
-            partial_results.append(result)
+        with span("chunking") as attrs:
+            chunk_budget = self.budget_planner.chars_per_chunk(model)
+            chunks = [] if hierarchical else self.chunker.chunk_files(java_files, max_chars=chunk_budget)
+            attrs.update(files=len(java_files), chunks=len(chunks), chunk_budget=chunk_budget)
 
-        if len(chunks) > 1:
-            merge_prompt = self.prompt_service.build_merge_prompt(partial_results)
-            logger.info("Merging %d partial results (merge_prompt_chars=%d)", len(partial_results), len(merge_prompt))
-            final_analysis = self.ollama_client.generate(merge_prompt, model)
+        logger.info("Starting analysis: %d files, %d chunk(s), chunk_budget=%d chars", len(java_files), len(chunks), chunk_budget)
+        budget = TokenBudget(token_budget)
+        # With several chunks, keep enough budget back for the merge call.
+        merge_reserve = self._merge_cost() if token_budget is not None and len(chunks) > 1 else 0
+        coverage = ChunkOutcome()
+        chunks_skipped = 0
+        latency_saved_ms = 0.0
+        summary_cache_hits = summaries_generated = 0
+        if hierarchical:
+            chunks, summary_cache_hits, summaries_generated = self._summarize_files(
+                java_files, model, budget, coverage, chunk_budget
+            )
+            final_analysis, chunks_skipped = self._analyze_summaries(
+                chunks, model, budget, coverage, prior_analysis
+            )
+        elif early_exit and len(chunks) > 1:
+            final_analysis, chunks_skipped, latency_saved_ms = self._analyze_early_exit(
+                chunks, model, budget, coverage, merge_reserve, prior_analysis
+            )
         else:
-            final_analysis = partial_results[0]
+            partial_results: List[str] = []
+            for idx, chunk in enumerate(chunks):
+                logger.info("Processing chunk %d/%d (%d files)", idx + 1, len(chunks), len(chunk))
+                outcome = self._run_chunk(
+                    chunk, idx, len(chunks), model, budget, merge_reserve, prior_analysis=prior_analysis
+                )
+                coverage.absorb(outcome)
+                if outcome.budget_skipped and not outcome.results:
+                    chunks_skipped += 1
+                partial_results.extend(result.content for result in outcome.results)
+            if not partial_results:
+                self._raise_no_results(coverage)
+            final_analysis = self._merge(partial_results, model, budget, coverage)
 
+        if coverage.skipped:
+            logger.warning("Analysis finished with partial coverage: %d file(s) skipped", len(coverage.skipped))
+        elif signature is not None and not coverage.errors:
+            # Only complete, merged analyses are indexed, so a degraded result is never reused.
+            self.project_index.add(signature, namespace, final_analysis)
         return AnalysisResponse(
             model_used=model,
             file_count=len(java_files),
             files_analyzed=list(java_files.keys()),
-            folder_structure=folder_tree,
+            folder_structure=self.file_service.build_folder_tree(java_files),
             raw_analysis=final_analysis,
-            chunks_used=len(chunks),
-            error=None,
+            chunks_used=len(chunks) - chunks_skipped,
+            chunk_char_budget=chunk_budget,
+            chunks_skipped=chunks_skipped,
+            latency_saved_ms=latency_saved_ms,
+            prompt_tokens=budget.prompt_tokens,
+            completion_tokens=budget.completion_tokens,
+            token_budget=token_budget,
+            files_covered=coverage.covered,
+            files_retried=sorted(set(coverage.retried)),
+            files_skipped=coverage.skipped,
+            summary_cache_hits=summary_cache_hits,
+            summaries_generated=summaries_generated,
+            similar_project_id=similar.project_id if similar else None,
+            similarity=similar.similarity if similar else None,
+            error="; ".join(dict.fromkeys(coverage.errors)) or None,
+        )
+
+    @staticmethod
+    def _raise_no_results(coverage: ChunkOutcome) -> None:
+        """Fail the analysis when no chunk produced a result."""
+        if coverage.errors:
+            raise HTTPException(status_code=502, detail=f"LM Studio failed on every chunk: {coverage.errors[-1]}")
+        raise HTTPException(status_code=400, detail="Token budget is too small to analyze any chunk.")
+
+    @staticmethod
+    def _merge_cost() -> int:
+        """Tokens to hold back for the merge: its capped prompt plus the smallest useful answer."""
+        prompt_tokens = int(settings.MAX_MERGE_CHARS / settings.CHARS_PER_TOKEN) + settings.PROMPT_OVERHEAD_TOKENS
+        return prompt_tokens + settings.MIN_OUTPUT_TOKENS
+
+    def _merge(self, partial_results: List[str], model: str, budget: TokenBudget, coverage: ChunkOutcome) -> str:
+        """Merge partial chunk results into one analysis, skipping the call for a single result.
+
+        When the results cannot be merged they are returned joined, and the reason is added to
+        ``coverage.errors`` so the response reports it and the analysis is not indexed.
+        """
+        if len(partial_results) == 1:
+            return partial_results[0]
+        with span("merge", partials=len(partial_results)):
+            merge_prompt = self.prompt_service.build_merge_prompt(partial_results)
+            logger.info("Merging %d partial results (merge_prompt_chars=%d)", len(partial_results), len(merge_prompt))
+            max_tokens = budget.reserve(merge_prompt, settings.MAX_TOKENS_MERGE)
+            if max_tokens is None:
+                logger.info("Token budget exhausted; returning unmerged partial results")
+                coverage.errors.append("Token budget exhausted before the merge; partial results are unmerged.")
+                return self._join_partials(partial_results)
+            try:
+                result = self._with_retries(
+                    lambda: self.ollama_client.complete(merge_prompt, model, max_tokens=max_tokens)
+                )[0]
+            except LLMError as exc:
+                budget.release(merge_prompt, max_tokens)
+                logger.warning("Merge failed (%s); returning unmerged partial results", exc.detail)
+                coverage.errors.append(f"Merge failed; partial results are unmerged: {exc.detail}")
+                return self._join_partials(partial_results)
+            except BaseException:
+                budget.release(merge_prompt, max_tokens)
+                raise
+            budget.settle(merge_prompt, max_tokens, result.prompt_tokens, result.completion_tokens)
+            return result.content
+
+    @staticmethod
+    def _join_partials(partial_results: List[str]) -> str:
+        """Concatenate partial results when they cannot be merged by the model."""
+        return "\n\n".join(
+            f"### PARTIAL ANALYSIS {idx}\n{result}" for idx, result in enumerate(partial_results, start=1)
+        )
+
+    @staticmethod
+    def _with_retries(call):
+        """Run an LLM call, retrying transient failures with full-jitter exponential backoff.
+
+        Returns the call's result and the number of attempts made.
+        """
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            try:
+                return call(), attempt + 1
+            except LLMTransientError as exc:
+                if attempt == settings.LLM_MAX_RETRIES:
+                    raise
+                delay = random.uniform(0, settings.LLM_RETRY_BASE_DELAY * 2 ** attempt)
+                logger.warning("Transient LLM failure (%s); retry %d in %.1fs", exc.detail, attempt + 1, delay)
+                time.sleep(delay)
+
+    def _timed_generate(
+        self, prompt: str, model: str, budget: TokenBudget, hold_back: int = 0, max_output: int | None = None
+    ) -> Tuple[Optional[LLMResult], float, int]:
+        """Run a chunk call within the token budget, recording the server's latency for chunk budgeting.
+
+        Returns the result (None when the budget cannot cover the call), the elapsed
+        seconds including queueing and retries, and the number of attempts.
+        """
+        max_tokens = budget.reserve(prompt, max_output or settings.MAX_TOKENS_CHUNK, hold_back)
+        if max_tokens is None:
+            return None, 0.0, 0
+        started = time.perf_counter()
+        try:
+            result, attempts = self._with_retries(
+                lambda: self.ollama_client.complete(prompt, model, max_tokens=max_tokens)
+            )
+        except BaseException:
+            budget.release(prompt, max_tokens)
+            raise
+        elapsed = time.perf_counter() - started
+        budget.settle(prompt, max_tokens, result.prompt_tokens, result.completion_tokens)
+        # Only the successful attempt's service time: queue waits and backoff are not model latency.
+        if result.service_seconds is not None:
+            self.budget_planner.record(model, len(prompt), result.service_seconds)
+        return result, elapsed, attempts
+
+    def _run_chunk(
+        self,
+        chunk: SourceSet,
+        idx: int,
+        total: int,
+        model: str,
+        budget: TokenBudget,
+        hold_back: int = 0,
+        require_verdict: bool = False,
+        depth: int = 0,
+        build_prompt: Callable[[SourceSet], str] | None = None,
+        max_output: int | None = None,
+        prior_analysis: str | None = None,
+    ) -> ChunkOutcome:
+        """Analyze one chunk, bisecting it on timeout or context overflow and skipping what still fails.
+
+        ``build_prompt`` replaces the default chunk prompt, e.g. for summary calls.
+        """
+        outcome = ChunkOutcome()
+        with span("prompt.build", chunk=idx + 1, depth=depth):
+            if build_prompt is not None:
+                prompt = build_prompt(chunk)
+            else:
+                prompt = self.prompt_service.build_chunk_prompt(
+                    chunk, idx, total, require_verdict=require_verdict, prior_analysis=prior_analysis
+                )
+        try:
+            result, elapsed, attempts = self._timed_generate(prompt, model, budget, hold_back, max_output)
+        except (LLMTimeoutError, LLMContextOverflowError) as exc:
+            pieces = self._split_chunk(chunk) if depth < settings.MAX_CHUNK_SPLITS else None
+            if not pieces:
+                logger.warning("Chunk %d/%d still failing after %d split(s); skipping %d file(s)", idx + 1, total, depth, len(chunk))
+                outcome.skipped.extend(chunk)
+                outcome.errors.append(exc.detail)
+                return outcome
+            logger.info("Chunk %d/%d failed (%s); retrying as %d smaller piece(s)", idx + 1, total, type(exc).__name__, len(pieces))
+            for piece in pieces:
+                sub = self._run_chunk(
+                    piece, idx, total, model, budget, hold_back, require_verdict, depth + 1,
+                    build_prompt, max_output, prior_analysis,
+                )
+                outcome.retried.extend(sub.covered)
+                outcome.absorb(sub)
+            return outcome
+        except LLMCancelledError as exc:
+            # Not a failure: early exit no longer needs the chunk, or the client went away.
+            logger.info("Chunk %d/%d cancelled (%s); skipping %d file(s)", idx + 1, total, exc.detail, len(chunk))
+            outcome.skipped.extend(chunk)
+            return outcome
+        except LLMError as exc:
+            logger.warning("Chunk %d/%d failed (%s); skipping %d file(s)", idx + 1, total, exc.detail, len(chunk))
+            outcome.skipped.extend(chunk)
+            outcome.errors.append(exc.detail)
+            return outcome
+
+        if result is None:
+            logger.info("Token budget exhausted; skipping chunk %d/%d", idx + 1, total)
+            outcome.skipped.extend(chunk)
+            outcome.budget_skipped = True
+            return outcome
+
+        outcome.results.append(result)
+        outcome.covered.extend(chunk)
+        if attempts > 1:
+            outcome.retried.extend(chunk)
+        outcome.elapsed = elapsed
+        return outcome
+
+    def _summarize_files(
+        self,
+        java_files: SourceSet,
+        model: str,
+        budget: TokenBudget,
+        coverage: ChunkOutcome,
+        chunk_budget: int,
+    ) -> Tuple[List[SourceSet], int, int]:
+        """Stage one of hierarchical analysis: summarize each file, reusing cached summaries.
+
+        Returns the summaries grouped into stage-two chunks, the number of files served
+        from the cache, and the number of summaries generated by the model.
+        """
+        with span("summarize") as attrs:
+            version = self.prompt_service.SUMMARY_PROMPT_VERSION
+            keys = {path: self.summary_cache.key(java_files.view(path), model, version) for path in java_files}
+            summaries_by_key = self.summary_cache.get_many(set(keys.values()))
+            cache_hits = sum(1 for key in keys.values() if key in summaries_by_key)
+
+            # Identical files, within the project or across uploads, are summarized once.
+            missing: Dict[str, str] = {}
+            for path, key in keys.items():
+                if key not in summaries_by_key and key not in missing:
+                    missing[key] = path
+            generated: Dict[str, str] = {}
+            if missing:
+                # Summary calls request MAX_TOKENS_SUMMARY, and every file in a call adds a summary to that answer.
+                summary_chunks = self.chunker.chunk_files(
+                    java_files.select(missing.values()),
+                    max_chars=self.budget_planner.chars_per_chunk(model, settings.MAX_TOKENS_SUMMARY),
+                    max_files=self._summary_files_per_call(),
+                )
+                # Keep enough budget back for the stage-two analysis call.
+                hold_back = self._merge_cost() if budget.total is not None else 0
+                for idx, chunk in enumerate(summary_chunks):
+                    logger.info("Summarizing chunk %d/%d (%d files)", idx + 1, len(summary_chunks), len(chunk))
+                    outcome = self._run_chunk(
+                        chunk, idx, len(summary_chunks), model, budget, hold_back,
+                        build_prompt=self.prompt_service.build_summary_prompt,
+                        max_output=settings.MAX_TOKENS_SUMMARY,
+                    )
+                    coverage.errors.extend(outcome.errors)
+                    for result in outcome.results:
+                        parsed = self.prompt_service.parse_file_summaries(result.content, list(chunk))
+                        generated.update((keys[path], summary) for path, summary in parsed.items())
+                self.summary_cache.put_many(generated)
+                summaries_by_key.update(generated)
+
+            # Files the model failed to summarize fall back to a declaration outline, which is not cached.
+            outlined = sum(1 for key in keys.values() if key not in summaries_by_key)
+            summaries = {
+                path: summaries_by_key.get(key) or self.prompt_service.outline_file(java_files[path])
+                for path, key in keys.items()
+            }
+            chunks = self.chunker.chunk_files(summaries, max_chars=chunk_budget)
+            attrs.update(cache_hits=cache_hits, generated=len(generated), chunks=len(chunks))
+        logger.info(
+            "Summaries: %d file(s) from cache, %d generated, %d outlined; %d stage-two chunk(s)",
+            cache_hits, len(generated), outlined, len(chunks),
+        )
+        return chunks, cache_hits, len(generated)
+
+    @staticmethod
+    def _summary_files_per_call() -> int:
+        """Return how many full-length file summaries fit in one summary answer."""
+        tokens_per_summary = settings.SUMMARY_MAX_CHARS / settings.CHARS_PER_TOKEN + _SUMMARY_HEADER_TOKENS
+        return max(1, int(settings.MAX_TOKENS_SUMMARY / tokens_per_summary))
+
+    def _analyze_summaries(
+        self,
+        chunks: List[SourceSet],
+        model: str,
+        budget: TokenBudget,
+        coverage: ChunkOutcome,
+        prior_analysis: str | None = None,
+    ) -> Tuple[str, int]:
+        """Stage two of hierarchical analysis: identify patterns from the file summaries.
+
+        Returns the final analysis and the number of chunks skipped for lack of budget.
+        """
+        merge_reserve = self._merge_cost() if budget.total is not None and len(chunks) > 1 else 0
+        partial_results: List[str] = []
+        chunks_skipped = 0
+        for idx, chunk in enumerate(chunks):
+            outcome = self._run_chunk(
+                chunk, idx, len(chunks), model, budget, merge_reserve,
+                build_prompt=lambda summaries, idx=idx: self.prompt_service.build_summary_analysis_prompt(
+                    summaries, idx, len(chunks), prior_analysis
+                ),
+            )
+            coverage.absorb(outcome)
+            if outcome.budget_skipped and not outcome.results:
+                chunks_skipped += 1
+            partial_results.extend(result.content for result in outcome.results)
+        if not partial_results:
+            self._raise_no_results(coverage)
+        return self._merge(partial_results, model, budget, coverage), chunks_skipped
+
+    @staticmethod
+    def _split_chunk(chunk: SourceSet) -> List[SourceSet] | None:
+        """Halve a chunk by files, or truncate a lone file, returning None when it cannot shrink further."""
+        paths = list(chunk)
+        if len(paths) > 1:
+            middle = len(paths) // 2
+            return [chunk.select(paths[:middle]), chunk.select(paths[middle:])]
+        path = paths[0]
+        size = chunk.size(path)
+        if size < _MIN_SPLIT_CHARS * 2:
+            return None
+        return [chunk.select(paths, {path: size // 2}, "\n\n[FILE TRUNCATED TO FIT MODEL LIMITS]")]
+
+    def _analyze_early_exit(
+        self,
+        chunks: List[SourceSet],
+        model: str,
+        budget: TokenBudget,
+        coverage: ChunkOutcome,
+        merge_reserve: int = 0,
+        prior_analysis: str | None = None,
+    ) -> Tuple[str, int, float]:
+        """Process chunks strongest-signal first and stop once enough chunks agree.
+
+        Returns the final analysis, the number of chunks never analyzed, and the
+        estimated latency saved in milliseconds. File coverage is added to ``coverage``.
+        """
+        ordered = self.chunker.rank_chunks(chunks)
+        total = len(ordered)
+        workers = max(1, min(settings.CHUNK_CONCURRENCY, total))
+        required = max(1, min(settings.EARLY_EXIT_MIN_AGREEMENT, total))
+
+        results: Dict[int, List[str]] = {}
+        durations: List[float] = []
+        votes: Dict[str, List[Tuple[float, str]]] = defaultdict(list)
+        winner: str | None = None
+        chunks_skipped = 0
+        budget_skipped = 0
+
+        request_scope = cancel_scope.get()
+        scopes: Dict[Future, CancelScope] = {}
+        pool = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures: Dict[Future, int] = {}
+            for idx, chunk in enumerate(ordered):
+                logger.info("Queueing chunk %d/%d (%d files)", idx + 1, total, len(chunk))
+                # Each worker call gets its own copy so the request id and trace follow it, and its
+                # own child cancel scope so it can be aborted once a winner is found.
+                context = contextvars.copy_context()
+                scope = CancelScope(request_scope)
+                context.run(cancel_scope.set, scope)
+                future = pool.submit(
+                    context.run, self._run_chunk, chunk, idx, total, model, budget, merge_reserve, True,
+                    prior_analysis=prior_analysis,
+                )
+                futures[future] = idx
+                scopes[future] = scope
+
+            pending = set(futures)
+            while pending and winner is None:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    idx = futures[future]
+                    outcome = future.result()
+                    coverage.absorb(outcome)
+                    if outcome.budget_skipped and not outcome.results:
+                        budget_skipped += 1
+                    if not outcome.results:
+                        continue
+                    results[idx] = [result.content for result in outcome.results]
+                    durations.append(outcome.elapsed)
+
+                    for result in outcome.results:
+                        pattern, confidence = self.prompt_service.parse_verdict(result.content)
+                        logger.info("Chunk %d/%d verdict: %s (confidence=%.2f)", idx + 1, total, pattern, confidence)
+                        if pattern and confidence >= settings.EARLY_EXIT_CONFIDENCE:
+                            votes[pattern].append((confidence, result.content))
+                            if winner is None and len(votes[pattern]) >= required:
+                                winner = pattern
+
+            # Chunks that have not started are dropped and in-flight calls are aborted. Waiting for the
+            # aborted calls keeps the token counts exact; a call that finished first is still counted.
+            in_flight = set()
+            for future in pending:
+                if not future.cancel():
+                    scopes[future].cancel(CANCEL_EARLY_EXIT)
+                    in_flight.add(future)
+            wait(in_flight)
+            for future in pending:
+                chunk = ordered[futures[future]]
+                if future in in_flight and future.exception() is None and future.result().results:
+                    coverage.covered.extend(chunk)
+                else:
+                    chunks_skipped += 1
+                    coverage.skipped.extend(chunk)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            for scope in scopes.values():
+                scope.close()
+
+        if winner is None:
+            flattened = [text for idx in sorted(results) for text in results[idx]]
+            if not flattened:
+                self._raise_no_results(coverage)
+            return self._merge(flattened, model, budget, coverage), budget_skipped, 0.0
+
+        _, winner_text = max(votes[winner], key=lambda vote: vote[0])
+        avg_call = sum(durations) / len(durations)
+        # Skipped chunks would have run in waves of `workers`, followed by the merge call.
+        latency_saved_ms = (math.ceil(chunks_skipped / workers) + 1) * avg_call * 1000
+        logger.info(
+            "Early exit on '%s' after %d/%d chunk(s); skipped %d, est. %.0f ms saved",
+            winner, len(results), total, chunks_skipped, latency_saved_ms,
         )
+        return winner_text, chunks_skipped + budget_skipped, latency_saved_ms
@@ -1,54 +1,104 @@
-import os
-import shutil
-import uuid
+import posixpath
 import zipfile
-from pathlib import Path
-from typing import Dict
+from typing import BinaryIO, List, Mapping
 
-from fastapi import HTTPException
+from fastapi import HTTPException, UploadFile
 
 from config import settings
+from utils.source_set import SourceSet, SourceSetBuilder
 
 
 class FileService:
-    """Handle file upload, extraction, traversal, and cleanup operations."""
-
-    def save_upload(self, file_bytes: bytes, filename: str) -> str:
-        """Save an uploaded file to the configured upload directory with a unique name."""
-        upload_dir = Path(settings.UPLOAD_DIR)
-        upload_dir.mkdir(parents=True, exist_ok=True)
-        unique_name = f"{uuid.uuid4().hex}_{filename}"
-        file_path = upload_dir / unique_name
-        file_path.write_bytes(file_bytes)
-        return str(file_path)
-
-    def extract_zip(self, zip_path: str) -> str:
-        """Extract a zip archive to a dedicated folder and return its path."""
+    """Handle upload limits, archive reading, and folder tree construction."""
+
+    def check_upload_size(self, upload: UploadFile) -> None:
+        """Reject an upload larger than MAX_FILE_SIZE_MB."""
+        if upload.size is not None and upload.size > settings.MAX_FILE_SIZE_MB * 1024 * 1024:
+            raise self._too_large(f"Upload exceeds {settings.MAX_FILE_SIZE_MB} MB.")
+
+    async def read_java_uploads(self, uploads: List[UploadFile]) -> SourceSet:
+        """Read uploaded .java files in bounded blocks into one SourceSet, enforcing MAX_FILE_SIZE_MB across all files."""
+        limit = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+        builder = SourceSetBuilder()
+        for upload in uploads:
+            if not upload.filename.lower().endswith(".java"):
+                continue
+            builder.begin(upload.filename)
+            while block := await upload.read(settings.UPLOAD_READ_CHUNK_BYTES):
+                if builder.nbytes + len(block) > limit:
+                    raise self._too_large(f"Uploaded files exceed {settings.MAX_FILE_SIZE_MB} MB in total.")
+                builder.write(block)
+        return builder.build()
+
+    def inspect_zip(self, zip_path: str | BinaryIO) -> int:
+        """Check archive limits against the central directory and return uncompressed .java bytes."""
         if not zipfile.is_zipfile(zip_path):
             raise HTTPException(status_code=400, detail="Uploaded file is not a valid zip archive.")
 
-        extract_path = f"{zip_path}_extracted"
         with zipfile.ZipFile(zip_path, "r") as zip_ref:
-            zip_ref.extractall(extract_path)
-        return extract_path
-
-    def walk_java_files(self, root_dir: str) -> Dict[str, str]:
-        """Recursively read Java files, skipping configured directories, and return their contents."""
-        java_files: Dict[str, str] = {}
-        for dirpath, dirnames, filenames in os.walk(root_dir):
-            dirnames[:] = [d for d in dirnames if d not in settings.SKIP_DIRS]
-            for filename in filenames:
-                if not filename.endswith(".java"):
+            entries = zip_ref.infolist()
+
+        if len(entries) > settings.MAX_ZIP_ENTRIES:
+            raise self._too_large(f"Archive has more than {settings.MAX_ZIP_ENTRIES} entries.")
+
+        total_uncompressed = 0
+        total_compressed = 0
+        java_bytes = 0
+        for info in entries:
+            total_uncompressed += info.file_size
+            total_compressed += info.compress_size
+            if info.compress_size and info.file_size / info.compress_size > settings.MAX_COMPRESSION_RATIO:
+                raise self._too_large(f"Archive entry {info.filename} has a suspicious compression ratio.")
+            if info.filename.endswith(".java"):
+                java_bytes += info.file_size
+
+        if total_uncompressed > settings.MAX_UNCOMPRESSED_MB * 1024 * 1024:
+            raise self._too_large(f"Archive expands beyond {settings.MAX_UNCOMPRESSED_MB} MB.")
+        if total_compressed and total_uncompressed / total_compressed > settings.MAX_COMPRESSION_RATIO:
+            raise self._too_large("Archive has a suspicious compression ratio.")
+        return java_bytes
+
+    def read_zip_sources(self, zip_path: str | BinaryIO) -> SourceSet:
+        """Read the .java entries of a zip archive straight into a SourceSet, without extracting to disk.
+
+        Entries outside the archive root or under SKIP_DIRS are ignored, and blank-line runs
+        are compressed as for every other source.
+        """
+        self.inspect_zip(zip_path)
+
+        # Entry headers can lie about sizes, so the byte limit is enforced while decompressing too.
+        remaining = settings.MAX_UNCOMPRESSED_MB * 1024 * 1024
+        builder = SourceSetBuilder()
+        with zipfile.ZipFile(zip_path, "r") as zip_ref:
+            for info in zip_ref.infolist():
+                relative_path = None if info.is_dir() else self.java_source_path(info.filename)
+                if relative_path is None:
                     continue
-                full_path = os.path.join(dirpath, filename)
-                relative_path = Path(os.path.relpath(full_path, start=root_dir)).as_posix()
-                with open(full_path, "r", encoding="utf-8", errors="ignore") as file:
-                    content = file.read()
-                cleaned_content = self._compress_blank_lines(content)
-                java_files[relative_path] = cleaned_content
-        return java_files
-
-    def build_folder_tree(self, java_files: Dict[str, str]) -> dict:
+                blocks: List[bytes] = []
+                with zip_ref.open(info) as src:
+                    while block := src.read(settings.UPLOAD_READ_CHUNK_BYTES):
+                        remaining -= len(block)
+                        if remaining < 0:
+                            raise self._too_large(f"Archive expands beyond {settings.MAX_UNCOMPRESSED_MB} MB.")
+                        blocks.append(block)
+                content = b"".join(blocks).decode("utf-8", errors="ignore")
+                builder.add(relative_path, self._compress_blank_lines(content))
+        return builder.build()
+
+    @staticmethod
+    def java_source_path(name: str) -> str | None:
+        """Return the normalized relative path of a .java file, or None if it is outside the root or under SKIP_DIRS."""
+        if not name.endswith(".java"):
+            return None
+        relative_path = posixpath.normpath(name)
+        parts = relative_path.split("/")
+        if relative_path.startswith("/") or ".." in parts:
+            return None
+        if any(part in settings.SKIP_DIRS for part in parts[:-1]):
+            return None
+        return relative_path
+
+    def build_folder_tree(self, java_files: Mapping[str, str]) -> dict:
         """Convert flat Java file paths into a nested folder tree representation."""
         tree: dict = {}
         for path in java_files.keys():
@@ -59,21 +109,10 @@ class FileService:
             current[parts[-1]] = None
         return tree
 
-    def cleanup(self, *paths: str) -> None:
-        """Delete files or directories, ignoring missing paths."""
-        for path in paths:
-            if not path:
-                continue
-            if os.path.isfile(path):
-                try:
-                    os.remove(path)
-                except OSError:
-                    continue
-            elif os.path.isdir(path):
-                try:
-                    shutil.rmtree(path)
-                except OSError:
-                    continue
+    @staticmethod
+    def _too_large(detail: str) -> HTTPException:
+        """Build the error raised when an upload exceeds a configured limit."""
+        return HTTPException(status_code=413, detail=detail)
 
     @staticmethod
     def _compress_blank_lines(content: str) -> str:
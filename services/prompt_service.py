@@ -1,10 +1,75 @@
-from typing import Dict, List
+import re
+from typing import Dict, List, Mapping, Optional, Tuple
 
 from config import settings
+from utils.source_set import SourceSet
+
+_VERDICT_PATTERN_RE = re.compile(
+    r"\*{0,2}Pattern(?:\s+Identified)?\*{0,2}[:：]\s*\*{0,2}(.+?)\*{0,2}$",
+    re.IGNORECASE | re.MULTILINE,
+)
+_VERDICT_CONFIDENCE_RE = re.compile(
+    r"\*{0,2}Confidence\*{0,2}[:：]\s*\*{0,2}\s*(\d+(?:\.\d+)?)\s*%?",
+    re.IGNORECASE,
+)
+# The verdict is requested on the answer's last two lines; a little slack allows a closing fence or sign-off.
+_VERDICT_TAIL_LINES = 4
+_SUMMARY_HEADER_RE = re.compile(r"^#{2,3}\s*FILE:\s*(\S+)\s*$", re.MULTILINE)
+_DECLARATION_RE = re.compile(
+    r"^\s*(?:@\w+\s+)*(?:(?:public|protected|private|abstract|final|static|sealed)\s+)*"
+    r"(?:class|interface|enum|record)\s+\w+[^{]*"
+    r"|^\s*(?:public|protected|private)\s+[\w<>\[\], ?]+\s*\([^)]*\)",
+    re.MULTILINE,
+)
+
+
+class _PromptWriter:
+    """Assemble a prompt line by line, equivalent to joining the lines with newlines.
+
+    File contents held in a SourceSet are copied straight from its buffer into the prompt,
+    so a chunk's sources are never materialized as separate strings first.
+    """
+
+    def __init__(self) -> None:
+        """Start an empty prompt."""
+        self._out = bytearray()
+
+    def line(self, text: str) -> None:
+        """Append one line."""
+        self._newline()
+        self._out += text.encode("utf-8", "surrogatepass")
+
+    def extend(self, lines: List[str]) -> None:
+        """Append several lines."""
+        for text in lines:
+            self.line(text)
+
+    def files(self, java_files: Mapping[str, str]) -> None:
+        """Append each file as a header, its content and a separator line."""
+        for path in java_files:
+            self.line(f"### FILE: {path}")
+            if isinstance(java_files, SourceSet):
+                self._newline()
+                self._out += java_files.view(path)
+                self._out += java_files.suffix(path).encode("utf-8")
+            else:
+                self.line(java_files[path])
+            self.line("-----")
+
+    def getvalue(self) -> str:
+        """Return the prompt text."""
+        return str(memoryview(self._out)[1:], "utf-8", "ignore")
+
+    def _newline(self) -> None:
+        self._out += b"\n"
+
 
 class PromptService:
     """Build prompts for chunked and merged LLM interactions."""
 
+    PROMPT_VERSION: str = "2"  # bump whenever prompt wording changes; recorded with benchmark runs
+    SUMMARY_PROMPT_VERSION: str = "1"  # part of the summary cache key; bump to invalidate cached summaries
+
     SYSTEM_PROMPT: str = (
         "You are a senior Java software architect and design pattern expert. "
         "Identify only one pattern truly present in the provided code. "
@@ -13,23 +78,129 @@ class PromptService:
     )
 
     def build_chunk_prompt(
-        self, java_files: Dict[str, str], chunk_index: int, total_chunks: int
+        self,
+        java_files: Mapping[str, str],
+        chunk_index: int,
+        total_chunks: int,
+        require_verdict: bool = False,
+        prior_analysis: Optional[str] = None,
     ) -> str:
         """Construct a prompt for a specific chunk of Java files."""
-        lines: List[str] = [self.SYSTEM_PROMPT]
+        prompt = _PromptWriter()
+        prompt.line(self.SYSTEM_PROMPT)
+        prompt.extend(self._prior_analysis_lines(prior_analysis))
 
         if total_chunks > 1:
-            lines.append(
+            prompt.line(
                 f"This is chunk {chunk_index + 1} of {total_chunks}. "
                 "Identify patterns observable so far."
             )
         else:
-            lines.append("Analyze the full project and provide the complete report.")
+            prompt.line("Analyze the full project and provide the complete report.")
+
+        prompt.files(java_files)
+
+        prompt.line("Provide structured findings with pattern names and evidence.")
+        if require_verdict:
+            prompt.line(
+                "End your answer with exactly these two lines:\n"
+                "Pattern Identified: <pattern name>\n"
+                "Confidence: <0-100>"
+            )
+        return prompt.getvalue()
 
-        for path, content in java_files.items():
+    @staticmethod
+    def _prior_analysis_lines(prior_analysis: Optional[str]) -> List[str]:
+        """Return prompt lines that share a structurally similar project's analysis as a hint."""
+        if not prior_analysis:
+            return []
+        hint = prior_analysis[: settings.SIMILARITY_SEED_CHARS]
+        if len(prior_analysis) > settings.SIMILARITY_SEED_CHARS:
+            hint += "\n[TRUNCATED]"
+        return [
+            "A structurally similar project was analyzed before with this result. "
+            "Use it as a hint only; confirm or correct it against the code below.",
+            "### PRIOR ANALYSIS",
+            hint,
+            "-----",
+        ]
+
+    def parse_verdict(self, raw: str) -> Tuple[Optional[str], float]:
+        """Extract the normalized pattern name and a 0..1 confidence from the last lines of a chunk answer."""
+        tail = "\n".join([line for line in raw.splitlines() if line.strip()][-_VERDICT_TAIL_LINES:])
+        pattern_matches = list(_VERDICT_PATTERN_RE.finditer(tail))
+        if not pattern_matches:
+            return None, 0.0
+        name = re.sub(r"[^a-z0-9 ]", " ", pattern_matches[-1].group(1).lower())
+        name = re.sub(r"\bpattern\b", " ", name)
+        name = " ".join(name.split())
+        if not name:
+            return None, 0.0
+
+        confidence = 0.0
+        confidence_matches = list(_VERDICT_CONFIDENCE_RE.finditer(tail))
+        if confidence_matches:
+            # The prompt asks for 0-100, so "Confidence: 1" is 1%, not certainty.
+            confidence = min(max(float(confidence_matches[-1].group(1)) / 100, 0.0), 1.0)
+        return name, confidence
+
+    def build_summary_prompt(self, java_files: Mapping[str, str]) -> str:
+        """Construct a prompt asking for a short role summary of each file."""
+        prompt = _PromptWriter()
+        prompt.extend([
+            "You are a senior Java software architect. Summarize the role of each file below "
+            "so that design patterns can later be identified from the summaries alone.",
+            "For every file, output a block in EXACTLY this format and nothing else:",
+            "### FILE: <path>",
+            "Kind: <class | abstract class | interface | enum | record> <Name> (extends/implements ...)",
+            "Collaborators: <types it holds, receives, creates or delegates to>",
+            "Structure: <notable structure: private constructors, static instances, factory or builder "
+            "methods, composition of its own supertype, listeners, wrappers>",
+            "Keep each summary under 5 lines. Use exact type names.",
+        ])
+        prompt.files(java_files)
+        return prompt.getvalue()
+
+    def parse_file_summaries(self, raw: str, paths: List[str]) -> Dict[str, str]:
+        """Split a summary answer into per-file summaries, keeping only the requested paths."""
+        wanted = set(paths)
+        by_name = {path.rsplit("/", 1)[-1]: path for path in paths}
+        headers = list(_SUMMARY_HEADER_RE.finditer(raw))
+        summaries: Dict[str, str] = {}
+        for idx, header in enumerate(headers):
+            end = headers[idx + 1].start() if idx + 1 < len(headers) else len(raw)
+            path = header.group(1).strip("`*")
+            path = path if path in wanted else by_name.get(path.rsplit("/", 1)[-1])
+            body = raw[header.end():end].strip().strip("-").strip()
+            if path and body:
+                summaries[path] = body[: settings.SUMMARY_MAX_CHARS]
+        return summaries
+
+    def outline_file(self, content: str) -> str:
+        """Derive a summary from a file's declarations when the model did not summarize it."""
+        declarations = [" ".join(match.group(0).split()) for match in _DECLARATION_RE.finditer(content)]
+        return ("Outline: " + "; ".join(declarations))[: settings.SUMMARY_MAX_CHARS]
+
+    def build_summary_analysis_prompt(
+        self,
+        summaries: Mapping[str, str],
+        chunk_index: int,
+        total_chunks: int,
+        prior_analysis: Optional[str] = None,
+    ) -> str:
+        """Construct a pattern-analysis prompt over per-file role summaries instead of raw code."""
+        lines: List[str] = [self.SYSTEM_PROMPT]
+        lines.extend(self._prior_analysis_lines(prior_analysis))
+        lines.append(
+            "The project's source files have been summarized below (kind, collaborators, notable structure). "
+            "Identify the design pattern from these summaries."
+        )
+        if total_chunks > 1:
+            lines.append(f"This is part {chunk_index + 1} of {total_chunks} of the summaries.")
+
+        for path, summary in summaries.items():
             lines.append(f"### FILE: {path}")
-            lines.append(content)
-            lines.append("-----")
+            lines.append(summary)
 
         lines.append("Provide structured findings with pattern names and evidence.")
         return "\n".join(lines)
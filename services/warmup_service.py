@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, List
+
+import requests
+
+from config import settings
+from llm.client import OllamaClient
+
+logger = logging.getLogger(__name__)
+
+
+class WarmupService:
+    """Keep configured models resident in LM Studio with periodic minimal generations."""
+
+    def __init__(self, ollama_client: OllamaClient | None = None) -> None:
+        """Initialize the scheduler around the client whose traffic decides which models matter."""
+        self.ollama_client = ollama_client or OllamaClient()
+        self.stats: Dict[str, dict] = {}
+        self._task: asyncio.Task | None = None
+        self._lock = threading.Lock()
+
+    def target_models(self) -> List[str]:
+        """Return the models to keep warm."""
+        if settings.WARMUP_MODELS:
+            return list(settings.WARMUP_MODELS)
+        models = [settings.DEFAULT_MODEL]
+        for model in self.ollama_client.most_used_models(settings.WARMUP_TOP_MODELS + 1):
+            if model not in models and len(models) <= settings.WARMUP_TOP_MODELS:
+                models.append(model)
+        return models
+
+    def warm_model(self, model: str) -> None:
+        """Ping a model unless real traffic already kept it warm, and record the latency."""
+        last_used = self.ollama_client.last_used.get(model)
+        if last_used is not None and time.monotonic() - last_used < settings.WARMUP_INTERVAL:
+            return
+
+        try:
+            elapsed_ms = self.ollama_client.warm_up(model) * 1000
+        except requests.exceptions.RequestException as exc:
+            logger.warning("Warm-up of %s failed: %s", model, exc)
+            with self._lock:
+                self.stats.setdefault(model, {})["last_error"] = str(exc)
+            return
+
+        with self._lock:
+            entry = self.stats.setdefault(model, {})
+            # The first successful ping pays the model load; later ones show the resident latency.
+            if "cold_latency_ms" not in entry:
+                entry["cold_latency_ms"] = round(elapsed_ms, 1)
+            else:
+                entry["warm_latency_ms"] = round(elapsed_ms, 1)
+            entry["last_warmed_at"] = time.time()
+            entry.pop("last_error", None)
+        logger.info("Warmed %s in %.0f ms", model, elapsed_ms)
+
+    async def run_once(self) -> None:
+        """Warm every target model without blocking the event loop."""
+        for model in self.target_models():
+            await asyncio.to_thread(self.warm_model, model)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Warm-up cycle failed")
+            await asyncio.sleep(settings.WARMUP_INTERVAL)
+
+    def start(self) -> None:
+        """Start the background warm-up loop; the first cycle runs immediately."""
+        if settings.WARMUP_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Cancel the background loop."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Return per-model cold and warm latency for health reporting."""
+        with self._lock:
+            return {model: dict(entry) for model, entry in self.stats.items()}
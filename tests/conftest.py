@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Modules are imported from the repository root, as the app and scripts do.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from config import settings
+from llm.scheduler import request_client
+from utils.admission import AdmissionController
+
+
+@pytest.fixture(autouse=True)
+def _admission_settings(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_INITIAL_CALL_SECONDS", 30.0)
+    monkeypatch.setattr(settings, "ADMISSION_MAX_PREDICTED_SECONDS", 300.0)
+    monkeypatch.setattr(settings, "ADMISSION_MAX_DEFER", 0.0)
+    monkeypatch.setattr(settings, "ADMISSION_MAX_PENDING_PER_CLIENT", 4)
+    monkeypatch.setattr(settings, "ADMISSION_LATENCY_SMOOTHING", 0.5)
+    monkeypatch.setattr(settings, "LLM_MAX_CONCURRENT_PER_BACKEND", 1)
+
+
+def _holding(controller: AdmissionController, estimated_calls: int, inner):
+    """Run ``inner`` while an analysis of ``estimated_calls`` is admitted."""
+    async def run():
+        async with controller.admit(estimated_calls):
+            return await inner()
+    return asyncio.run(run())
+
+
+def test_estimate_calls_counts_chunks_plus_the_merge():
+    assert AdmissionController.estimate_calls(0, 8000) == 1
+    assert AdmissionController.estimate_calls(8000, 8000) == 1
+    assert AdmissionController.estimate_calls(8001, 8000) == 3
+    assert AdmissionController.estimate_calls(24000, 8000) == 4
+
+
+def test_admitted_work_is_queued_until_it_finishes():
+    controller = AdmissionController()
+
+    async def inner():
+        assert controller.queued_calls() == 5
+        assert controller.estimate_queue_seconds() == 150.0
+        controller.record_call(10.0)
+        return controller.queued_calls()
+
+    assert _holding(controller, 5, inner) == 4
+    assert controller.queued_calls() == 0
+    assert controller.avg_call_seconds == 20.0
+
+
+def test_over_limit_analysis_gets_503_with_retry_after():
+    controller = AdmissionController()
+
+    async def inner():
+        controller.check_capacity()  # (5 + 1) calls * 30s = 180s
+        with pytest.raises(HTTPException) as exc_info:
+            async with controller.admit(6):  # (5 + 6) calls * 30s = 330s
+                pass
+        return exc_info.value
+
+    exc = _holding(controller, 5, inner)
+    assert exc.status_code == 503
+    assert exc.headers["Retry-After"] == "30"
+    assert controller.snapshot()["rejected"] == 1
+
+
+def test_check_capacity_rejects_when_the_queue_is_full():
+    controller = AdmissionController()
+
+    async def inner():
+        with pytest.raises(HTTPException) as exc_info:
+            controller.check_capacity()
+        return exc_info.value.status_code
+
+    assert _holding(controller, 10, inner) == 503
+
+
+def test_too_many_analyses_from_one_client_get_429(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_MAX_PENDING_PER_CLIENT", 1)
+    controller = AdmissionController()
+
+    async def inner():
+        with pytest.raises(HTTPException) as exc_info:
+            async with controller.admit(1):
+                pass
+        request_client.set("client-b")
+        async with controller.admit(1):
+            pass
+        return exc_info.value
+
+    token = request_client.set("client-a")
+    try:
+        exc = _holding(controller, 1, inner)
+    finally:
+        request_client.reset(token)
+    assert exc.status_code == 429
+    assert exc.headers["Retry-After"] == "30"
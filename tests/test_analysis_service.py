@@ -0,0 +1,223 @@
+import logging
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from config import settings
+from llm.cancellation import cancel_scope
+from llm.client import LLMCancelledError, LLMError, LLMResult, LLMTimeoutError, LLMTransientError
+from llm.project_index import ProjectIndex
+from services.analysis_service import AnalysisService
+from utils.source_set import SourceSet
+
+MERGE_MARKER = "Merge the following partial analyses"
+
+
+class StubClient:
+    """Stand-in for OllamaClient that answers every call through ``handler(prompt)``."""
+
+    def __init__(self, handler, service_seconds=None):
+        self.handler = handler
+        self.service_seconds = service_seconds
+        self.prompts = []
+
+    def complete(self, prompt, model, max_tokens=None):
+        self.prompts.append(prompt)
+        answer = self.handler(prompt)
+        if isinstance(answer, Exception):
+            raise answer
+        return LLMResult(content=answer, prompt_tokens=10, completion_tokens=10, service_seconds=self.service_seconds)
+
+    def get_context_length(self, model):
+        return None
+
+
+def _service(handler, tmp_path):
+    client = StubClient(handler)
+    service = AnalysisService(ollama_client=client, project_index=ProjectIndex(str(tmp_path / "index.sqlite3")))
+    return service, client
+
+
+def _project(files: int = 2, size: int = 5000) -> dict:
+    """Java files each about ``size`` bytes, so the default chunk size holds one per chunk."""
+    return {
+        f"src/C{i}.java": f"public class C{i} {{\n" + "    // filler line\n" * (size // 20) + "}\n"
+        for i in range(files)
+    }
+
+
+@pytest.fixture(autouse=True)
+def _no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RETRY_BASE_DELAY", 0.0)
+
+
+def test_failed_merge_is_reported_and_not_indexed(tmp_path):
+    def handler(prompt):
+        if MERGE_MARKER in prompt:
+            return LLMTransientError("LM Studio returned status 503: busy")
+        return "Pattern Identified: Singleton"
+
+    service, _ = _service(handler, tmp_path)
+    first = service.analyze(_project(), "model", reuse_similar=True)
+    assert first.raw_analysis.startswith("### PARTIAL ANALYSIS 1")
+    assert first.error is not None and "unmerged" in first.error
+
+    second = service.analyze(_project(), "model", reuse_similar=True)
+    assert not second.reused
+    assert second.similar_project_id is None
+
+
+def test_merged_analysis_is_indexed_and_reused(tmp_path):
+    service, _ = _service(lambda prompt: "merged" if MERGE_MARKER in prompt else "partial", tmp_path)
+    first = service.analyze(_project(), "model", reuse_similar=True)
+    assert (first.raw_analysis, first.error) == ("merged", None)
+
+    second = service.analyze(_project(), "model", reuse_similar=True)
+    assert second.reused and second.raw_analysis == "merged"
+
+
+def _until_cancelled():
+    """Block like an in-flight call until the worker's cancel scope is cancelled."""
+    scope = cancel_scope.get()
+    cancelled = threading.Event()
+    scope.subscribe(cancelled.set)
+    assert scope.cancelled or cancelled.wait(timeout=5), "in-flight call was never cancelled"
+    return LLMCancelledError("LLM call cancelled.")
+
+
+def test_early_exit_stops_once_enough_chunks_agree(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "CHUNK_CONCURRENCY", 4)
+    monkeypatch.setattr(settings, "EARLY_EXIT_MIN_AGREEMENT", 2)
+    caplog.set_level(logging.INFO, logger="services.analysis_service")
+
+    def handler(prompt):
+        if "class C1 " in prompt or "class C3 " in prompt:
+            return _until_cancelled()
+        return "Looks like a singleton.\nPattern Identified: Singleton\nConfidence: 90"
+
+    service, client = _service(handler, tmp_path)
+    response = service.analyze(_project(4), "model", early_exit=True)
+    assert response.raw_analysis.endswith("Confidence: 90")
+    assert response.chunks_skipped == 2
+    assert sorted(response.files_skipped) == ["src/C1.java", "src/C3.java"]
+    assert sorted(response.files_covered) == ["src/C0.java", "src/C2.java"]
+    assert response.error is None
+    assert not any(MERGE_MARKER in prompt for prompt in client.prompts)
+    # Aborting chunks that are no longer needed is not a chunk failure.
+    assert not [record for record in caplog.records if "failed" in record.getMessage()]
+
+
+def test_early_exit_merges_when_chunks_disagree(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CHUNK_CONCURRENCY", 2)
+    monkeypatch.setattr(settings, "EARLY_EXIT_MIN_AGREEMENT", 2)
+    verdicts = iter(["Singleton", "Observer", "Builder"])
+    lock = threading.Lock()
+
+    def handler(prompt):
+        if MERGE_MARKER in prompt:
+            return "merged"
+        with lock:
+            return f"Pattern Identified: {next(verdicts)}\nConfidence: 95"
+
+    service, _ = _service(handler, tmp_path)
+    response = service.analyze(_project(3), "model", early_exit=True)
+    assert response.raw_analysis == "merged"
+    assert (response.chunks_used, response.chunks_skipped) == (3, 0)
+    assert len(response.files_covered) == 3
+
+
+def test_low_confidence_verdicts_do_not_vote(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CHUNK_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "EARLY_EXIT_MIN_AGREEMENT", 2)
+
+    def handler(prompt):
+        return "merged" if MERGE_MARKER in prompt else "Pattern Identified: Singleton\nConfidence: 1"
+
+    service, _ = _service(handler, tmp_path)
+    response = service.analyze(_project(3), "model", early_exit=True)
+    assert response.raw_analysis == "merged"
+    assert response.chunks_skipped == 0
+
+
+def test_planner_records_service_time_not_queueing_or_backoff(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RETRY_BASE_DELAY", 0.05)
+    attempts = []
+
+    def handler(prompt):
+        attempts.append(prompt)
+        return LLMTransientError("busy") if len(attempts) == 1 else "Pattern Identified: Singleton"
+
+    service = AnalysisService(
+        ollama_client=StubClient(handler, service_seconds=0.001),
+        project_index=ProjectIndex(str(tmp_path / "index.sqlite3")),
+    )
+    recorded = []
+    monkeypatch.setattr(service.budget_planner, "record", lambda model, chars, elapsed: recorded.append(elapsed))
+    response = service.analyze(_project(1), "model")
+    assert response.files_retried == ["src/C0.java"]
+    assert recorded == [0.001]
+
+
+def test_timed_out_chunk_is_bisected_and_retried(tmp_path):
+    def handler(prompt):
+        if MERGE_MARKER in prompt:
+            return "merged"
+        if prompt.count("public class C") > 1:
+            return LLMTimeoutError("LM Studio timed out after 300s.")
+        return "partial"
+
+    service, client = _service(handler, tmp_path)
+    response = service.analyze(_project(2, size=2000), "model")
+    assert response.raw_analysis == "merged"
+    assert sorted(response.files_covered) == ["src/C0.java", "src/C1.java"]
+    assert response.files_retried == ["src/C0.java", "src/C1.java"]
+    assert (response.files_skipped, response.error) == ([], None)
+
+
+def test_transient_errors_are_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 2)
+    failures = iter([LLMTransientError("busy"), LLMTransientError("busy")])
+    service, client = _service(lambda prompt: next(failures, "done"), tmp_path)
+    response = service.analyze(_project(1), "model")
+    assert response.raw_analysis == "done"
+    assert len(client.prompts) == 3
+    assert response.files_retried == ["src/C0.java"]
+
+
+def test_persistent_failures_are_skipped_with_partial_coverage(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 1)
+
+    def handler(prompt):
+        if "public class C1 " in prompt:
+            return LLMTransientError("LM Studio returned status 500: crashed")
+        if "public class C2 " in prompt:
+            return LLMTimeoutError("LM Studio timed out after 300s.")
+        return "partial"
+
+    service, _ = _service(handler, tmp_path)
+    response = service.analyze(_project(3), "model", reuse_similar=True)
+    # C0 alone came back, so there is nothing to merge.
+    assert response.raw_analysis == "partial"
+    assert response.files_covered == ["src/C0.java"]
+    assert sorted(response.files_skipped) == ["src/C1.java", "src/C2.java"]
+    assert "crashed" in response.error and "timed out" in response.error
+    assert service.analyze(_project(3), "model", reuse_similar=True).similar_project_id is None
+
+
+def test_every_chunk_failing_is_a_502(tmp_path):
+    service, _ = _service(lambda prompt: LLMError("LM Studio returned status 400: bad"), tmp_path)
+    with pytest.raises(HTTPException) as exc_info:
+        service.analyze(_project(2), "model")
+    assert exc_info.value.status_code == 502
+
+
+def test_split_chunk_halves_files_then_truncates_a_lone_file():
+    sources = SourceSet.from_files({"A.java": "a" * 3000, "B.java": "b" * 10, "C.java": "c" * 10})
+    halves = AnalysisService._split_chunk(sources)
+    assert [list(half) for half in halves] == [["A.java"], ["B.java", "C.java"]]
+
+    (truncated,) = AnalysisService._split_chunk(halves[0])
+    assert truncated.size("A.java") == 1500
+    assert truncated["A.java"].endswith("[FILE TRUNCATED TO FIT MODEL LIMITS]")
+    assert AnalysisService._split_chunk(sources.select(["B.java"])) is None
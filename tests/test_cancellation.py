@@ -0,0 +1,51 @@
+import pytest
+
+from llm.cancellation import CANCEL_DISCONNECTED, CANCEL_EARLY_EXIT, CancelScope, cancel_scope, cancellation_stats
+from llm.client import LLMCancelledError, OllamaClient
+
+
+def test_child_scope_takes_the_parent_reason():
+    parent = CancelScope()
+    child = CancelScope(parent)
+    parent.cancel()
+    assert child.cancelled and child.reason == CANCEL_DISCONNECTED
+
+
+def test_child_scope_cancelled_alone_keeps_its_reason_and_parent_runs_on():
+    parent = CancelScope()
+    child = CancelScope(parent)
+    child.cancel(CANCEL_EARLY_EXIT)
+    parent.cancel()
+    assert child.reason == CANCEL_EARLY_EXIT
+    assert CancelScope(CancelScope()).reason is None
+
+
+def test_closed_child_is_not_cancelled_with_its_parent():
+    parent = CancelScope()
+    child = CancelScope(parent)
+    child.close()
+    parent.cancel()
+    assert not child.cancelled
+
+
+def _skipped_call(reason: str) -> None:
+    scope = CancelScope()
+    scope.cancel(reason)
+    token = cancel_scope.set(scope)
+    try:
+        with pytest.raises(LLMCancelledError):
+            OllamaClient("http://127.0.0.1:9").complete("prompt", "model", max_tokens=100)
+    finally:
+        cancel_scope.reset(token)
+
+
+def test_early_exit_cancellations_are_counted_apart_from_disconnects():
+    before = cancellation_stats.snapshot()
+    _skipped_call(CANCEL_EARLY_EXIT)
+    after = cancellation_stats.snapshot()
+    assert after["calls_skipped"] == before["calls_skipped"]
+    assert after["tokens_saved_estimate"] == before["tokens_saved_estimate"]
+    assert after["early_exit"]["calls_skipped"] == before["early_exit"]["calls_skipped"] + 1
+
+    _skipped_call(CANCEL_DISCONNECTED)
+    assert cancellation_stats.snapshot()["calls_skipped"] == before["calls_skipped"] + 1
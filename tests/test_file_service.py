@@ -0,0 +1,64 @@
+import io
+import zipfile
+
+import pytest
+from fastapi import HTTPException
+
+from config import settings
+from services.file_service import FileService
+
+
+def _zip(entries: dict, compression: int = zipfile.ZIP_STORED) -> io.BytesIO:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression) as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return buffer
+
+
+def _status(call) -> int:
+    with pytest.raises(HTTPException) as exc_info:
+        call()
+    return exc_info.value.status_code
+
+
+def test_inspect_zip_returns_uncompressed_java_bytes():
+    archive = _zip({"src/A.java": b"class A {}", "README.md": b"readme"})
+    assert FileService().inspect_zip(archive) == len(b"class A {}")
+
+
+def test_inspect_zip_rejects_non_zip_uploads():
+    assert _status(lambda: FileService().inspect_zip(io.BytesIO(b"not a zip"))) == 400
+
+
+def test_inspect_zip_rejects_too_many_entries(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_ZIP_ENTRIES", 2)
+    archive = _zip({f"src/F{i}.java": b"class F {}" for i in range(3)})
+    assert _status(lambda: FileService().inspect_zip(archive)) == 413
+
+
+def test_inspect_zip_rejects_archives_expanding_past_the_limit(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_UNCOMPRESSED_MB", 1)
+    archive = _zip({"src/Big.java": b"x" * (1024 * 1024 + 1)})
+    assert _status(lambda: FileService().inspect_zip(archive)) == 413
+
+
+def test_inspect_zip_rejects_suspicious_compression_ratios():
+    archive = _zip({"src/Bomb.java": b"\0" * (1024 * 1024)}, zipfile.ZIP_DEFLATED)
+    assert _status(lambda: FileService().inspect_zip(archive)) == 413
+
+
+def test_read_zip_sources_skips_escaping_and_skipped_entries():
+    skipped_dir = sorted(settings.SKIP_DIRS)[0]
+    archive = _zip({
+        "src/A.java": b"class A {}\n\n\n\n\nclass B {}",
+        "src/../../Escape.java": b"class Escape {}",
+        "/abs/Abs.java": b"class Abs {}",
+        f"src/{skipped_dir}/Skip.java": b"class Skip {}",
+        "src/notes.txt": b"text",
+    })
+    sources = FileService().read_zip_sources(archive)
+    assert list(sources) == ["src/A.java"]
+    # Runs of blank lines are compressed to two.
+    assert sources["src/A.java"] == "class A {}\n\n\nclass B {}"
@@ -0,0 +1,54 @@
+from llm.project_index import ProjectIndex, signature_shingles
+
+SHAPES = {
+    "src/shapes/Shape.java": "package shapes;\npublic interface Shape {\n    double area();\n}\n",
+    "src/shapes/Circle.java": (
+        "package shapes;\npublic class Circle implements Shape {\n"
+        "    private final double radius;\n"
+        "    public Circle(double radius) { this.radius = radius; }\n"
+        "    public double area() { return Math.PI * radius * radius; }\n}\n"
+    ),
+}
+
+
+def _fork(files: dict) -> dict:
+    """Rename the package and paths and change method bodies, keeping the class signatures."""
+    return {
+        path.replace("shapes", "geometry"): content.replace("shapes", "geometry").replace("Math.PI", "3.14")
+        for path, content in files.items()
+    }
+
+
+def _index(tmp_path) -> ProjectIndex:
+    return ProjectIndex(str(tmp_path / "index.sqlite3"))
+
+
+def test_shingles_ignore_packages_paths_and_bodies():
+    assert signature_shingles(SHAPES) == signature_shingles(_fork(SHAPES))
+    assert "Circle::public double area()" in signature_shingles(SHAPES)
+
+
+def test_project_without_declarations_has_no_signature(tmp_path):
+    assert _index(tmp_path).signature({"Empty.java": "// nothing here"}) is None
+
+
+def test_add_then_lookup_round_trips(tmp_path):
+    index = _index(tmp_path)
+    project_id = index.add(index.signature(SHAPES), "model|v1", "Strategy over shapes")
+    similar = index.lookup(index.signature(_fork(SHAPES)), "model|v1", 0.9)
+    assert (similar.project_id, similar.similarity, similar.analysis) == (project_id, 1.0, "Strategy over shapes")
+
+
+def test_lookup_is_scoped_by_namespace_and_threshold(tmp_path):
+    index = _index(tmp_path)
+    index.add(index.signature(SHAPES), "model|v1", "analysis")
+    assert index.lookup(index.signature(SHAPES), "model|v2", 0.0) is None
+
+    unrelated = {"Queue.java": "public class Queue<T> {\n    public void push(T item) {}\n    public T pop() { return null; }\n}\n"}
+    assert index.lookup(index.signature(unrelated), "model|v1", 0.5) is None
+
+
+def test_index_persists_across_instances(tmp_path):
+    _index(tmp_path).add(_index(tmp_path).signature(SHAPES), "model|v1", "persisted")
+    reopened = _index(tmp_path)
+    assert reopened.lookup(reopened.signature(SHAPES), "model|v1", 0.9).analysis == "persisted"
@@ -0,0 +1,74 @@
+from config import settings
+from services.prompt_service import PromptService
+
+
+def test_parse_verdict_reads_the_closing_lines():
+    answer = "Pattern Identified: Observer\nThe code registers listeners.\nConfidence: 85"
+    assert PromptService().parse_verdict(answer) == ("observer", 0.85)
+
+
+def test_parse_verdict_ignores_earlier_pattern_mentions():
+    answer = (
+        "Candidate pattern: Strategy (weak)\n"
+        "Confidence: 20\n"
+        "FooFactory creates families of related products.\n\n"
+        "Pattern Identified: Abstract Factory\n"
+        "Confidence: 85"
+    )
+    assert PromptService().parse_verdict(answer) == ("abstract factory", 0.85)
+
+
+def test_parse_verdict_accepts_markdown_and_percent():
+    answer = "Analysis...\n**Pattern Identified:** **Singleton Pattern**\n**Confidence:** 90%\n```"
+    assert PromptService().parse_verdict(answer) == ("singleton", 0.9)
+
+
+def test_parse_verdict_reads_confidence_on_the_requested_0_to_100_scale():
+    assert PromptService().parse_verdict("Pattern Identified: Builder\nConfidence: 1") == ("builder", 0.01)
+    assert PromptService().parse_verdict("Pattern Identified: Builder\nConfidence: 250") == ("builder", 1.0)
+
+
+def test_parse_verdict_without_a_verdict():
+    assert PromptService().parse_verdict("No clear pattern here.") == (None, 0.0)
+    assert PromptService().parse_verdict("Pattern Identified: Adapter") == ("adapter", 0.0)
+
+
+def test_parse_file_summaries_splits_blocks_by_file_header():
+    answer = (
+        "### FILE: src/a/Shape.java\nKind: interface Shape\nCollaborators: none\n\n"
+        "### FILE: `src/b/Circle.java`\nKind: class Circle (implements Shape)\n---\n"
+    )
+    summaries = PromptService().parse_file_summaries(answer, ["src/a/Shape.java", "src/b/Circle.java"])
+    assert summaries == {
+        "src/a/Shape.java": "Kind: interface Shape\nCollaborators: none",
+        "src/b/Circle.java": "Kind: class Circle (implements Shape)",
+    }
+
+
+def test_parse_file_summaries_matches_bare_names_and_drops_unrequested_files():
+    answer = "## FILE: Circle.java\nKind: class Circle\n### FILE: Other.java\nKind: class Other\n### FILE: Empty.java\n"
+    summaries = PromptService().parse_file_summaries(answer, ["src/b/Circle.java", "src/Empty.java"])
+    assert summaries == {"src/b/Circle.java": "Kind: class Circle"}
+
+
+def test_parse_file_summaries_caps_each_summary(monkeypatch):
+    monkeypatch.setattr(settings, "SUMMARY_MAX_CHARS", 10)
+    summaries = PromptService().parse_file_summaries("### FILE: A.java\n" + "x" * 50, ["A.java"])
+    assert summaries == {"A.java": "x" * 10}
+
+
+def test_outline_file_lists_type_and_public_member_declarations():
+    content = (
+        "package shapes;\n"
+        "@Deprecated\n"
+        "public abstract class Shape implements Comparable<Shape> {\n"
+        "    private int sides;\n"
+        "    public Shape(int sides) { this.sides = sides; }\n"
+        "    protected abstract double area();\n"
+        "    static class Cache {}\n"
+        "}\n"
+    )
+    assert PromptService().outline_file(content) == (
+        "Outline: @Deprecated public abstract class Shape implements Comparable<Shape>; "
+        "public Shape(int sides); protected abstract double area(); static class Cache"
+    )
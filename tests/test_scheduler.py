@@ -0,0 +1,110 @@
+import threading
+import time
+
+from llm.cancellation import CancelScope, ScopeCancelled, cancel_scope
+from llm.scheduler import LLMScheduler, Priority
+
+
+def _queued(scheduler: LLMScheduler) -> int:
+    return sum(scheduler.snapshot()["queued"].values())
+
+
+def _wait_until_queued(scheduler: LLMScheduler, count: int) -> None:
+    deadline = time.monotonic() + 5
+    while _queued(scheduler) < count:
+        assert time.monotonic() < deadline, "calls were never queued"
+        time.sleep(0.005)
+
+
+def _run_queued(scheduler: LLMScheduler, calls: list) -> list:
+    """Queue calls behind a held slot one at a time, then release and return the order they ran in."""
+    order = []
+    lock = threading.Lock()
+
+    def call(label, cost, priority, client):
+        with scheduler.slot(cost, priority, client):
+            with lock:
+                order.append(label)
+
+    scheduler.acquire(1, Priority.BULK, "holder")
+    threads = []
+    for idx, (label, cost, priority, client) in enumerate(calls):
+        thread = threading.Thread(target=call, args=(label, cost, priority, client))
+        thread.start()
+        threads.append(thread)
+        _wait_until_queued(scheduler, idx + 1)
+    scheduler.release()
+    for thread in threads:
+        thread.join(timeout=5)
+    return order
+
+
+def test_interactive_calls_run_before_queued_bulk_calls():
+    scheduler = LLMScheduler(max_concurrent=1)
+    order = _run_queued(scheduler, [
+        ("bulk-1", 100, Priority.BULK, "a"),
+        ("bulk-2", 100, Priority.BULK, "b"),
+        ("interactive", 100, Priority.INTERACTIVE, "c"),
+    ])
+    assert order == ["interactive", "bulk-1", "bulk-2"]
+
+
+def test_clients_share_a_class_fairly_regardless_of_submission_order():
+    scheduler = LLMScheduler(max_concurrent=1)
+    order = _run_queued(scheduler, [
+        ("a-1", 100, Priority.BULK, "a"),
+        ("a-2", 100, Priority.BULK, "a"),
+        ("a-3", 100, Priority.BULK, "a"),
+        ("b-1", 100, Priority.BULK, "b"),
+    ])
+    # b's first call starts at the same virtual time as a's first, ahead of a's backlog.
+    assert order.index("b-1") < order.index("a-2")
+
+
+def test_cheaper_calls_advance_a_client_less_in_virtual_time():
+    scheduler = LLMScheduler(max_concurrent=1)
+    order = _run_queued(scheduler, [
+        ("big-1", 1000, Priority.BULK, "big"),
+        ("big-2", 1000, Priority.BULK, "big"),
+        ("small-1", 100, Priority.BULK, "small"),
+        ("small-2", 100, Priority.BULK, "small"),
+        ("small-3", 100, Priority.BULK, "small"),
+    ])
+    assert order.index("small-3") < order.index("big-2")
+
+
+def test_snapshot_reports_active_and_queued_calls():
+    scheduler = LLMScheduler(max_concurrent=2)
+    scheduler.acquire(1, Priority.BULK, "a")
+    snapshot = scheduler.snapshot()
+    assert snapshot["active"] == 1
+    assert snapshot["max_concurrent"] == 2
+    assert snapshot["queued"] == {"interactive": 0, "bulk": 0}
+    scheduler.release()
+    assert scheduler.snapshot()["active"] == 0
+
+
+def test_cancelling_a_scope_removes_its_queued_call():
+    scheduler = LLMScheduler(max_concurrent=1)
+    scheduler.acquire(1, Priority.BULK, "holder")
+    scope = CancelScope()
+    outcome = []
+
+    def queued_call():
+        cancel_scope.set(scope)
+        try:
+            scheduler.acquire(1, Priority.INTERACTIVE, "a")
+        except ScopeCancelled:
+            outcome.append("cancelled")
+
+    thread = threading.Thread(target=queued_call)
+    thread.start()
+    _wait_until_queued(scheduler, 1)
+    scope.cancel()
+    thread.join(timeout=5)
+    assert outcome == ["cancelled"]
+    assert _queued(scheduler) == 0
+    scheduler.release()
+    # The slot is free for the next caller.
+    scheduler.acquire(1, Priority.BULK, "b")
+    assert scheduler.snapshot()["active"] == 1
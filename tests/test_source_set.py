@@ -0,0 +1,108 @@
+from llm.chunker import Chunker
+from utils.source_set import SourceSet, SourceSetBuilder
+
+NOTE = "\n[CUT]"
+
+
+def test_from_files_round_trips_contents_and_order():
+    files = {"b/B.java": "class B {}", "a/A.java": "class A { String s = \"é\"; }"}
+    sources = SourceSet.from_files(files)
+    assert list(sources) == ["b/B.java", "a/A.java"]
+    assert dict(sources) == files
+    assert SourceSet.from_files(sources) is sources
+
+
+def test_size_and_nbytes_count_utf8_bytes():
+    sources = SourceSet.from_files({"A.java": "é" * 3, "B.java": "abc"})
+    assert sources.size("A.java") == 6
+    assert sources.nbytes == 9
+    assert bytes(sources.view("A.java")) == "ééé".encode("utf-8")
+
+
+def test_select_shares_buffer_and_keeps_order_of_paths():
+    sources = SourceSet.from_files({"A.java": "aaa", "B.java": "bbb", "C.java": "ccc"})
+    view = sources.select(["C.java", "A.java"])
+    assert list(view) == ["C.java", "A.java"]
+    assert view["C.java"] == "ccc"
+    assert view.view("A.java").obj is sources.view("A.java").obj
+
+
+def test_select_limits_cut_files_and_append_note():
+    sources = SourceSet.from_files({"A.java": "abcdefgh", "B.java": "xy"})
+    view = sources.select(["A.java", "B.java"], {"A.java": 3, "B.java": 5}, NOTE)
+    assert view["A.java"] == "abc" + NOTE
+    assert view.suffix("A.java") == NOTE
+    assert view.size("A.java") == 3
+    # A limit at or above the file size leaves it untouched.
+    assert view["B.java"] == "xy"
+    assert view.suffix("B.java") == ""
+
+
+def test_select_keeps_existing_suffix_unless_cut_again():
+    sources = SourceSet.from_files({"A.java": "abcdefgh"})
+    cut = sources.select(["A.java"], {"A.java": 6}, NOTE)
+    assert cut.select(["A.java"])["A.java"] == "abcdef" + NOTE
+    recut = cut.select(["A.java"], {"A.java": 2}, "\n[AGAIN]")
+    assert recut["A.java"] == "ab\n[AGAIN]"
+
+
+def test_cut_inside_a_multibyte_character_drops_the_partial_character():
+    sources = SourceSet.from_files({"A.java": "aé"})
+    assert sources.select(["A.java"], {"A.java": 2}, NOTE)["A.java"] == "a" + NOTE
+
+
+def test_builder_streams_blocks_and_replaces_repeated_paths():
+    builder = SourceSetBuilder()
+    builder.begin("A.java")
+    builder.write(b"class ")
+    builder.write(b"A {}")
+    builder.add("B.java", "class B {}")
+    builder.add("A.java", "class A2 {}")
+    sources = builder.build()
+    assert dict(sources) == {"B.java": "class B {}", "A.java": "class A2 {}"}
+
+
+def test_chunk_files_measures_non_ascii_sources_in_bytes():
+    # 10 characters but 20 UTF-8 bytes each.
+    files = {f"F{i}.java": "é" * 10 for i in range(3)}
+    chunks = Chunker().chunk_files(files, max_chars=40)
+    assert [list(chunk) for chunk in chunks] == [["F0.java", "F1.java"], ["F2.java"]]
+    assert all(isinstance(chunk, SourceSet) for chunk in chunks)
+    assert [chunk.nbytes for chunk in chunks] == [40, 20]
+
+
+def test_chunk_files_truncates_oversized_files_to_the_byte_limit():
+    files = {"Big.java": "é" * 30, "Small.java": "x"}
+    chunks = Chunker().chunk_files(files, max_chars=21)
+    big = chunks[0]["Big.java"]
+    assert big.endswith("\n\n[FILE TRUNCATED DUE TO SIZE]")
+    # 21 bytes cut mid-character keep 10 whole characters.
+    assert big.removesuffix("\n\n[FILE TRUNCATED DUE TO SIZE]") == "é" * 10
+    # The truncated file plus its note fills the chunk, so the next file starts a new one.
+    assert [list(chunk) for chunk in chunks] == [["Big.java"], ["Small.java"]]
+
+
+def test_chunk_files_respects_max_files():
+    files = {f"F{i}.java": "x" for i in range(5)}
+    chunks = Chunker().chunk_files(files, max_chars=1000, max_files=2)
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+
+
+def test_rank_chunks_puts_abstraction_dense_chunks_first():
+    sources = SourceSet.from_files({
+        "Plain.java": "class Plain {}\n" + "// body\n" * 50,
+        "Shape.java": "interface Shape {}\nabstract class Base implements Shape {}\n",
+        "Port.java": "interface Port {}\n" + "// body\n" * 100,
+    })
+    chunks = [sources.select([path]) for path in sources]
+    assert [list(chunk) for chunk in Chunker().rank_chunks(chunks)] == [["Shape.java"], ["Port.java"], ["Plain.java"]]
+
+
+def test_rank_chunks_boosts_the_entry_point():
+    sources = SourceSet.from_files({
+        "Shape.java": "interface Shape {}\n" + "// body\n" * 200,
+        "Runner.java": "class Runner { public static void main(String[] args) {} }",
+        "App.java": "class App {}",
+    })
+    ranked = Chunker().rank_chunks([sources.select([path]) for path in sources])
+    assert [list(chunk)[0] for chunk in ranked][2] == "Shape.java"
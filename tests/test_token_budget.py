@@ -0,0 +1,51 @@
+from config import settings
+from llm.client import estimate_tokens
+from llm.token_budget import TokenBudget
+
+PROMPT = "x" * 350  # 100 tokens at the default CHARS_PER_TOKEN
+
+
+def test_unlimited_budget_grants_the_full_cap_and_records_usage():
+    budget = TokenBudget()
+    assert budget.reserve(PROMPT, 512) == 512
+    assert budget.remaining is None
+    budget.settle(PROMPT, 512, prompt_tokens=90, completion_tokens=40)
+    assert (budget.prompt_tokens, budget.completion_tokens, budget.used) == (90, 40, 130)
+
+
+def test_reserve_caps_output_to_what_is_left():
+    prompt_tokens = estimate_tokens(PROMPT)
+    budget = TokenBudget(prompt_tokens + 300)
+    assert budget.reserve(PROMPT, 1024) == 300
+    assert budget.remaining == 0
+
+
+def test_reserve_refuses_calls_below_the_minimum_output():
+    prompt_tokens = estimate_tokens(PROMPT)
+    budget = TokenBudget(prompt_tokens + settings.MIN_OUTPUT_TOKENS - 1)
+    assert budget.reserve(PROMPT, 1024) is None
+    assert budget.remaining == prompt_tokens + settings.MIN_OUTPUT_TOKENS - 1
+
+
+def test_hold_back_is_kept_out_of_the_grant():
+    prompt_tokens = estimate_tokens(PROMPT)
+    budget = TokenBudget(prompt_tokens + 1000)
+    assert budget.reserve(PROMPT, 1024, hold_back=600) == 400
+    assert budget.reserve(PROMPT, 1024, hold_back=600) is None
+
+
+def test_settle_replaces_the_reservation_with_actual_usage():
+    prompt_tokens = estimate_tokens(PROMPT)
+    budget = TokenBudget(1000)
+    granted = budget.reserve(PROMPT, 500)
+    assert budget.remaining == 1000 - prompt_tokens - granted
+    budget.settle(PROMPT, granted, prompt_tokens=prompt_tokens, completion_tokens=50)
+    assert budget.remaining == 1000 - prompt_tokens - 50
+
+
+def test_release_returns_a_reservation_for_a_failed_call():
+    budget = TokenBudget(1000)
+    granted = budget.reserve(PROMPT, 500)
+    budget.release(PROMPT, granted)
+    assert budget.remaining == 1000
+    assert budget.used == 0
@@ -0,0 +1,127 @@
+import asyncio
+import itertools
+import math
+import threading
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict
+
+from fastapi import HTTPException
+
+from config import settings
+from llm.scheduler import request_client
+
+
+@dataclass
+class _Admission:
+    client: str
+    estimated_calls: int
+    done_calls: int = 0
+
+    @property
+    def remaining_calls(self) -> int:
+        return max(self.estimated_calls - self.done_calls, 0)
+
+
+_current_admission: ContextVar[_Admission | None] = ContextVar("current_admission", default=None)
+
+
+class AdmissionController:
+    """Admit analyses only while the queued LLM work is predicted to finish within the time limit."""
+
+    def __init__(self) -> None:
+        """Initialize with no pending work and the configured prior for call latency."""
+        self.avg_call_seconds = settings.ADMISSION_INITIAL_CALL_SECONDS
+        self.rejected = 0
+        self._pending: Dict[int, _Admission] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def estimate_calls(source_chars: int, chunk_chars: int) -> int:
+        """Estimate LLM calls for a project: one per chunk plus the merge when there are several."""
+        chunks = max(1, math.ceil(source_chars / max(chunk_chars, 1)))
+        return chunks + (1 if chunks > 1 else 0)
+
+    def queued_calls(self) -> int:
+        """Return the LLM calls still expected from admitted analyses."""
+        with self._lock:
+            return sum(a.remaining_calls for a in self._pending.values())
+
+    def estimate_queue_seconds(self, extra_calls: int = 0) -> float:
+        """Predict how long the queued work plus extra calls takes on the backend's slots."""
+        calls = self.queued_calls() + extra_calls
+        return calls * self.avg_call_seconds / max(settings.LLM_MAX_CONCURRENT_PER_BACKEND, 1)
+
+    def check_capacity(self) -> None:
+        """Reject a new analysis when the queue alone is already too long; called before the upload is read."""
+        self._raise_if_over(self.estimate_queue_seconds(1))
+
+    def record_call(self, elapsed: float) -> None:
+        """Fold an observed LLM call duration into the latency estimate and count it as progress."""
+        alpha = settings.ADMISSION_LATENCY_SMOOTHING
+        with self._lock:
+            self.avg_call_seconds = (1 - alpha) * self.avg_call_seconds + alpha * elapsed
+            admission = _current_admission.get()
+            if admission is not None:
+                admission.done_calls += 1
+
+    @asynccontextmanager
+    async def admit(self, estimated_calls: int) -> AsyncIterator[None]:
+        """Hold a place for an analysis, deferring up to ADMISSION_MAX_DEFER seconds before rejecting it."""
+        client = request_client.get()
+        with self._lock:
+            client_pending = sum(1 for a in self._pending.values() if a.client == client)
+        if client_pending >= settings.ADMISSION_MAX_PENDING_PER_CLIENT:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many analyses in progress for this client. Please wait for one to finish.",
+                headers={"Retry-After": str(max(1, math.ceil(self.avg_call_seconds)))},
+            )
+
+        deadline = time.monotonic() + settings.ADMISSION_MAX_DEFER
+        while self.estimate_queue_seconds(estimated_calls) > settings.ADMISSION_MAX_PREDICTED_SECONDS:
+            if time.monotonic() >= deadline:
+                self._raise_if_over(self.estimate_queue_seconds(estimated_calls))
+            await asyncio.sleep(1)
+
+        admission = _Admission(client, estimated_calls)
+        with self._lock:
+            admission_id = next(self._ids)
+            self._pending[admission_id] = admission
+        token = _current_admission.set(admission)
+        try:
+            yield
+        finally:
+            _current_admission.reset(token)
+            with self._lock:
+                self._pending.pop(admission_id, None)
+
+    def snapshot(self) -> dict:
+        """Return the current queue estimate for health reporting."""
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending_analyses": pending,
+            "queued_calls": self.queued_calls(),
+            "avg_call_seconds": round(self.avg_call_seconds, 2),
+            "estimated_queue_seconds": round(self.estimate_queue_seconds(), 1),
+            "max_predicted_seconds": settings.ADMISSION_MAX_PREDICTED_SECONDS,
+            "rejected": self.rejected,
+        }
+
+    def _raise_if_over(self, predicted: float) -> None:
+        limit = settings.ADMISSION_MAX_PREDICTED_SECONDS
+        if predicted > limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail=f"Server is at capacity (estimated queue {predicted:.0f}s). Please retry later.",
+                headers={"Retry-After": str(max(1, math.ceil(predicted - limit)))},
+            )
+
+
+admission_controller = AdmissionController()
@@ -0,0 +1,39 @@
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+from fastapi import HTTPException
+
+from config import settings
+
+
+class MemoryBudget:
+    """Process-wide accounting of source bytes held by in-flight analyses."""
+
+    def __init__(self, limit_bytes: int | None = None) -> None:
+        """Initialize the budget with a byte limit, defaulting to MAX_ANALYSIS_MEMORY_MB."""
+        self.limit_bytes = limit_bytes or settings.MAX_ANALYSIS_MEMORY_MB * 1024 * 1024
+        self.in_use = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def reserve(self, source_bytes: int) -> Iterator[int]:
+        """Reserve memory for an analysis of the given source size, rejecting it when the budget is full."""
+        needed = int(source_bytes * settings.ANALYSIS_MEMORY_FACTOR)
+        with self._lock:
+            # A single request larger than the whole budget is still admitted when nothing else runs.
+            if self.in_use and self.in_use + needed > self.limit_bytes:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Server is busy with other analyses. Please retry shortly.",
+                    headers={"Retry-After": "10"},
+                )
+            self.in_use += needed
+        try:
+            yield needed
+        finally:
+            with self._lock:
+                self.in_use -= needed
+
+
+memory_budget = MemoryBudget()
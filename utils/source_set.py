@@ -0,0 +1,135 @@
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, Tuple
+
+
+class SourceSet(Mapping):
+    """Java sources of one project kept in a single UTF-8 buffer with a path -> (offset, length) index.
+
+    It behaves as a read-only ``Mapping[str, str]``: a file is decoded only when it is
+    accessed, so code written against ``Dict[str, str]`` keeps working without the whole
+    project existing as separate strings. ``select`` returns views that share the buffer,
+    which is how chunks and truncated files are represented without copying content.
+    """
+
+    __slots__ = ("_buffer", "_index", "_suffixes")
+
+    def __init__(
+        self,
+        buffer: bytes | bytearray,
+        index: Dict[str, Tuple[int, int]],
+        suffixes: Dict[str, str] | None = None,
+    ) -> None:
+        """Wrap a buffer and its index; suffixes are appended to files when decoded, e.g. truncation notes."""
+        self._buffer = memoryview(buffer)
+        self._index = index
+        self._suffixes = suffixes or {}
+
+    @classmethod
+    def from_files(cls, java_files: Mapping) -> "SourceSet":
+        """Return the mapping itself if it is a SourceSet, otherwise pack its files into one."""
+        if isinstance(java_files, SourceSet):
+            return java_files
+        builder = SourceSetBuilder()
+        for path, content in java_files.items():
+            builder.add(path, content)
+        return builder.build()
+
+    def __getitem__(self, path: str) -> str:
+        offset, length = self._index[path]
+        return str(self._buffer[offset:offset + length], "utf-8", "ignore") + self._suffixes.get(path, "")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, path: object) -> bool:
+        return path in self._index
+
+    def __repr__(self) -> str:
+        return f"SourceSet({len(self)} files, {self.nbytes} bytes)"
+
+    @property
+    def nbytes(self) -> int:
+        """Return the size of the files in this view, in bytes."""
+        return sum(length for _, length in self._index.values())
+
+    def size(self, path: str) -> int:
+        """Return a file's size in bytes without decoding it."""
+        return self._index[path][1]
+
+    def view(self, path: str) -> memoryview:
+        """Return a zero-copy view of a file's UTF-8 bytes (without any suffix)."""
+        offset, length = self._index[path]
+        return self._buffer[offset:offset + length]
+
+    def suffix(self, path: str) -> str:
+        """Return the text appended to a file when it is decoded, e.g. a truncation note."""
+        return self._suffixes.get(path, "")
+
+    def select(
+        self,
+        paths: Iterable[str],
+        limits: Dict[str, int] | None = None,
+        note: str = "",
+    ) -> "SourceSet":
+        """Return a view of some files sharing this buffer, cutting files in ``limits`` to that many bytes.
+
+        Cut files get ``note`` appended when decoded; other files keep their current suffix.
+        """
+        limits = limits or {}
+        index: Dict[str, Tuple[int, int]] = {}
+        suffixes: Dict[str, str] = {}
+        for path in paths:
+            offset, length = self._index[path]
+            if path in limits and limits[path] < length:
+                index[path] = (offset, limits[path])
+                suffixes[path] = note
+            else:
+                index[path] = (offset, length)
+                if path in self._suffixes:
+                    suffixes[path] = self._suffixes[path]
+        return SourceSet(self._buffer, index, suffixes)
+
+
+class SourceSetBuilder:
+    """Append files into one growing buffer and produce a SourceSet over it."""
+
+    def __init__(self) -> None:
+        """Start with an empty buffer."""
+        self._buffer = bytearray()
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._current: str | None = None
+        self._start = 0
+
+    def add(self, path: str, content: str | bytes) -> None:
+        """Append a whole file."""
+        self.begin(path)
+        self.write(content.encode("utf-8", "surrogatepass") if isinstance(content, str) else content)
+
+    def begin(self, path: str) -> None:
+        """Start a file whose bytes follow through ``write``; a repeated path replaces the earlier one."""
+        self._finish()
+        self._current = path
+        self._start = len(self._buffer)
+
+    def write(self, block: bytes) -> None:
+        """Append bytes to the current file."""
+        self._buffer += block
+
+    @property
+    def nbytes(self) -> int:
+        """Return the bytes buffered so far."""
+        return len(self._buffer)
+
+    def build(self) -> SourceSet:
+        """Finish the last file and return the SourceSet; the builder must not be used afterwards."""
+        self._finish()
+        return SourceSet(self._buffer, self._index)
+
+    def _finish(self) -> None:
+        if self._current is not None:
+            self._index.pop(self._current, None)
+            self._index[self._current] = (self._start, len(self._buffer) - self._start)
+            self._current = None
@@ -0,0 +1,181 @@
+import cProfile
+import logging
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Incoming X-Request-ID values are reused only when they are this shape; they end up in logs and headers.
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+_trace_var: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+
+
+@dataclass
+class Span:
+    """A timed step within a request trace."""
+
+    name: str
+    start_ms: float
+    duration_ms: float
+    attrs: Dict[str, object] = field(default_factory=dict)
+
+
+class Trace:
+    """Collect spans for a single request, safely across worker threads."""
+
+    def __init__(self, request_id: str, profile_requested: bool = False) -> None:
+        """Initialize an empty trace for the given correlation id."""
+        self.request_id = request_id
+        self.profile_requested = profile_requested
+        self.profile_path: str | None = None
+        self.started = time.perf_counter()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        """Append a finished span."""
+        with self._lock:
+            self.spans.append(span)
+
+    def elapsed_ms(self) -> float:
+        """Return milliseconds since the trace started."""
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self) -> str:
+        """Summarize span durations per name as a Server-Timing header value."""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for span in self.spans:
+                totals[span.name] = totals.get(span.name, 0.0) + span.duration_ms
+        return ", ".join(f"{name.replace('.', '-')};dur={ms:.1f}" for name, ms in totals.items())
+
+    def to_dict(self) -> dict:
+        """Return a JSON-serializable view of the trace."""
+        with self._lock:
+            spans = [span.__dict__.copy() for span in self.spans]
+        return {
+            "request_id": self.request_id,
+            "profile_available": self.profile_path is not None,
+            "spans": spans,
+        }
+
+
+class TraceStore:
+    """Keep the most recent finished traces in memory for lookup by request id."""
+
+    def __init__(self, max_traces: int | None = None) -> None:
+        """Initialize the store with a bound on retained traces."""
+        self.max_traces = max_traces or settings.TRACE_HISTORY_SIZE
+        self._traces: "OrderedDict[str, Trace]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, trace: Trace) -> None:
+        """Store a trace, evicting the oldest beyond the bound."""
+        with self._lock:
+            replaced = self._traces.get(trace.request_id)
+            if replaced is not None and replaced.profile_path and replaced.profile_path != trace.profile_path:
+                Path(replaced.profile_path).unlink(missing_ok=True)
+            self._traces[trace.request_id] = trace
+            self._traces.move_to_end(trace.request_id)
+            while len(self._traces) > self.max_traces:
+                _, evicted = self._traces.popitem(last=False)
+                if evicted.profile_path:
+                    Path(evicted.profile_path).unlink(missing_ok=True)
+
+    def get(self, request_id: str) -> Trace | None:
+        """Return a stored trace, or None if unknown or evicted."""
+        with self._lock:
+            return self._traces.get(request_id)
+
+
+trace_store = TraceStore()
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request id to every log record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Set record.request_id from the active request context."""
+        record.request_id = request_id_var.get()
+        return True
+
+
+def new_request_id() -> str:
+    """Generate a short correlation id."""
+    return uuid.uuid4().hex[:16]
+
+
+def request_id_from_header(value: str | None) -> str:
+    """Reuse a client-supplied correlation id when it is well-formed, otherwise generate one."""
+    if value and _REQUEST_ID_RE.match(value):
+        return value
+    return new_request_id()
+
+
+def start_trace(request_id: str, profile_requested: bool = False) -> Trace:
+    """Create a trace and make it current for this context."""
+    trace = Trace(request_id, profile_requested)
+    request_id_var.set(request_id)
+    _trace_var.set(trace)
+    return trace
+
+
+def current_trace() -> Trace | None:
+    """Return the trace of the request being handled, if any."""
+    return _trace_var.get()
+
+
+@contextmanager
+def span(name: str, **attrs: object) -> Iterator[Dict[str, object]]:
+    """Time a block as a span of the current trace; yields a dict for extra attributes."""
+    trace = _trace_var.get()
+    started = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        if trace is not None:
+            duration_ms = (time.perf_counter() - started) * 1000
+            trace.add(Span(name, (started - trace.started) * 1000, duration_ms, attrs))
+            logger.debug("span %s took %.1f ms %s", name, duration_ms, attrs)
+
+
+@contextmanager
+def profile_request() -> Iterator[None]:
+    """Capture a CPU profile of the block when the current request asked for one.
+
+    Only the calling thread is profiled; chunk calls running on worker threads
+    show up as time spent waiting on their futures.
+    """
+    trace = _trace_var.get()
+    if trace is None or not trace.profile_requested or not settings.PROFILING_ENABLED:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profile_dir = Path(settings.PROFILE_DIR).resolve()
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        # The file name never comes from the client, even a validated request id.
+        path = (profile_dir / f"{uuid.uuid4().hex}.prof").resolve()
+        if path.parent != profile_dir:
+            logger.warning("Refusing to write profile outside %s", profile_dir)
+            return
+        profiler.dump_stats(str(path))
+        trace.profile_path = str(path)
+        logger.info("CPU profile written to %s", path)